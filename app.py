@@ -1,6 +1,9 @@
+import os
+import threading
 import streamlit as st
 import streamlit_option_menu
 import database
+import avatar_store
 
 # SESSION STATE INIT 
 if 'user_id' not in st.session_state:
@@ -20,6 +23,33 @@ if 'avatar' not in st.session_state:
 if 'show_profile_upload' not in st.session_state:
     st.session_state.show_profile_upload = False
 
+# ADMIN TABLE PAGING
+ADMIN_PAGE_SIZE = database.PAGE_SIZE
+
+def paged_rows(key, fetch, sort_col="timestamp"):
+    """
+    One keyset page of an admin table plus Prev/Next controls.
+    ``fetch(limit, before)`` is a paginated database getter; the cursors of
+    the pages visited so far are kept in session state.
+    """
+    cursors = st.session_state.setdefault(f"{key}_cursors", [None])
+    rows = fetch(ADMIN_PAGE_SIZE + 1, cursors[-1])
+    has_next = len(rows) > ADMIN_PAGE_SIZE
+    rows = rows[:ADMIN_PAGE_SIZE]
+
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if st.button("◀ Prev", key=f"{key}_prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with col_page:
+        st.caption(f"Page {len(cursors)}")
+    with col_next:
+        if st.button("Next ▶", key=f"{key}_next", disabled=not has_next):
+            cursors.append(database.page_cursor(rows, sort_col))
+            st.rerun()
+    return rows
+
 #PAGE CONFIG
 st.set_page_config(
     page_title="EmoRecs | Emotion-Based Recommendation System",
@@ -27,6 +57,27 @@ st.set_page_config(
     layout="wide"
 )
 
+# BACKGROUND MODEL WARM-UP
+# OpenCV / TensorFlow / DeepFace load once per server process on a daemon
+# thread; Home and Auth render straight away. EMORECS_WARMUP=0 turns it off.
+WARMUP_MODELS = os.environ.get("EMORECS_WARMUP", "1") != "0"
+
+@st.cache_resource(show_spinner=False)
+def start_model_warmup():
+    """Start the warm-up thread (cached, so it runs once per process)"""
+    def warm():
+        try:
+            import emotion_detection_page
+            emotion_detection_page.warm_up()
+        except Exception as e:
+            print(f"Model warm-up failed: {e}")
+    thread = threading.Thread(target=warm, name="emorecs-warmup", daemon=True)
+    thread.start()
+    return thread
+
+if WARMUP_MODELS:
+    start_model_warmup()
+
 # CUSTOM CSS 
 st.markdown("""
 <style>
@@ -568,9 +619,10 @@ if st.session_state.logged_in:
     col_img, col_btn = st.sidebar.columns([3, 0.8], gap="small")
     
     with col_img:
-        if st.session_state.avatar:
+        avatar_bytes = avatar_store.load_avatar(st.session_state.avatar)
+        if avatar_bytes:
             try:
-                st.image(st.session_state.avatar, width=60)
+                st.image(avatar_bytes, width=60)
             except Exception:
                 st.image("https://i.pravatar.cc/200?u=" + (st.session_state.username or "user"), width=60)
         else:
@@ -586,21 +638,23 @@ if st.session_state.logged_in:
         uploaded_image = st.sidebar.file_uploader("Select image", type=["jpg", "jpeg", "png"], key="profile_pic_upload", label_visibility="collapsed")
         
         if uploaded_image is not None:
-            # Read and save the image
-            import base64
-            image_bytes = uploaded_image.read()
-            image_base64 = base64.b64encode(image_bytes).decode('utf-8')
-            image_data_uri = f"data:image/{uploaded_image.type};base64,{image_base64}"
+            # Thumbnail into the avatar store; only the key goes in the users row
+            try:
+                avatar_key = avatar_store.save_avatar(uploaded_image.read())
+            except ValueError as e:
+                avatar_key = None
+                st.error(str(e))
             
-            st.session_state.avatar = image_data_uri
-            st.session_state.show_profile_upload = False
-            # Update in database
-            success, message = database.update_user_profile(st.session_state.user_id, avatar=image_data_uri)
-            if success:
-                st.success("Photo updated!")
-                st.rerun()
-            else:
-                st.error(message)
+            if avatar_key:
+                st.session_state.avatar = avatar_key
+                st.session_state.show_profile_upload = False
+                # Update in database
+                success, message = database.update_user_profile(st.session_state.user_id, avatar=avatar_key)
+                if success:
+                    st.success("Photo updated!")
+                    st.rerun()
+                else:
+                    st.error(message)
     
     # User details (compact)
     st.sidebar.markdown(f"<p style='margin: 0; padding: 0; font-size: 0.9rem;'><b>{st.session_state.username or 'User'}</b></p>", unsafe_allow_html=True)
@@ -806,7 +860,13 @@ elif selected == "Auth":
                     profile_data = database.get_user_profile(user_data['id'])
                     if profile_data:
                         st.session_state.age = profile_data.get('age')
-                        st.session_state.avatar = profile_data.get('avatar')
+                        avatar = profile_data.get('avatar')
+                        # Older accounts hold the whole image as a data URI
+                        legacy_key = avatar_store.migrate_legacy_avatar(avatar)
+                        if legacy_key:
+                            database.update_user_profile(user_data['id'], avatar=legacy_key)
+                            avatar = legacy_key
+                        st.session_state.avatar = avatar
                     st.success(message)
                     st.rerun()
                 else:
@@ -854,9 +914,9 @@ elif selected == "Dashboard":
     </div>
     """, unsafe_allow_html=True)
     
-    activities = database.get_user_activity(st.session_state.user_id)
+    activities = database.get_recent_user_activity(st.session_state.user_id, limit=10)
     if activities:
-        for activity in activities[:10]:
+        for activity in activities:
             st.markdown(f"""
             <div class="step">
                 <h4>{activity['action']}</h4>
@@ -897,7 +957,7 @@ elif selected == "Admin":
         <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); border-radius: 15px; padding: 20px; margin-top: 10px; box-shadow: 0 4px 15px rgba(0,0,0,0.3);">
             <h3 style="color: #ffffff !important; font-weight: bold; font-size: 1.4rem; margin-bottom: 15px; text-shadow: 1px 1px 3px rgba(0,0,0,0.3);">📋 Registered Users</h3>
         """, unsafe_allow_html=True)
-        users = database.get_all_users()
+        users = paged_rows("admin_users", database.get_all_users, sort_col="created_at")
         if users:
             import pandas as pd
             df = pd.DataFrame(users)
@@ -941,7 +1001,8 @@ elif selected == "Admin":
     
     with tab2:
         st.markdown("<h3 style='color: #ffffff !important;'>📝 User Activity</h3>", unsafe_allow_html=True)
-        activities = database.get_user_activity()
+        activities = paged_rows("admin_activity",
+                                lambda limit, before: database.get_user_activity(limit=limit, before=before))
         if activities:
             import pandas as pd
             df = pd.DataFrame(activities)
@@ -950,8 +1011,19 @@ elif selected == "Admin":
             st.info("No activity recorded yet!")
     
     with tab3:
+        # Daily trend from the rollup tables (never scans the raw logs)
+        from datetime import datetime, timedelta, timezone
+        since = (datetime.now(timezone.utc) - timedelta(days=29)).strftime("%Y-%m-%d")
+        trend = database.get_emotion_trend(granularity="day", since=since)
+        if trend:
+            import pandas as pd
+            st.markdown("Emotions per Day (last 30 days)")
+            trend_df = pd.DataFrame(trend).pivot(index="bucket", columns="emotion", values="count").fillna(0)
+            st.bar_chart(trend_df)
+        
         st.markdown("Emotion Detection Logs")
-        emotion_logs = database.get_emotion_logs()
+        emotion_logs = paged_rows("admin_emotion_logs",
+                                  lambda limit, before: database.get_emotion_logs(limit=limit, before=before))
         if emotion_logs:
             import pandas as pd
             df = pd.DataFrame(emotion_logs)
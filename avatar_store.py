@@ -0,0 +1,112 @@
+"""
+Avatar storage — content-addressed thumbnails on disk.
+
+Uploads are decoded, cropped to a square thumbnail and re-encoded as JPEG.
+The file is stored under its sha256, and only that key goes into
+users.avatar. Identical uploads share one file, and the login query no
+longer carries the image.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import re
+from functools import lru_cache
+
+AVATAR_DIR = os.environ.get("EMORECS_AVATAR_DIR", "avatars")
+AVATAR_SIZE = 256             # thumbnails are AVATAR_SIZE x AVATAR_SIZE
+AVATAR_JPEG_QUALITY = 85
+AVATAR_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+AVATAR_CACHE_ENTRIES = 256    # decoded thumbnails kept by load_avatar
+
+_KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_avatar_key(value):
+    """True for a blob-store key (as opposed to a legacy data URI / URL)."""
+    return isinstance(value, str) and bool(_KEY_RE.match(value))
+
+
+def _avatar_path(key):
+    # Two-level fan-out keeps directories small
+    return os.path.join(AVATAR_DIR, key[:2], f"{key}.jpg")
+
+
+def make_thumbnail(image_bytes, size=AVATAR_SIZE, quality=AVATAR_JPEG_QUALITY):
+    """Decode an uploaded image and return a size x size JPEG (center crop)."""
+    from PIL import Image, ImageOps
+
+    if len(image_bytes) > AVATAR_MAX_UPLOAD_BYTES:
+        raise ValueError("Image is too large")
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            # draft() lets the JPEG decoder downscale while decoding
+            img.draft("RGB", (size * 2, size * 2))
+            img = ImageOps.exif_transpose(img)
+            img = ImageOps.fit(img.convert("RGB"), (size, size), Image.LANCZOS)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Unreadable image: {e}") from e
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def save_avatar(image_bytes):
+    """Thumbnail an upload, store it, and return its key for users.avatar."""
+    thumb = make_thumbnail(image_bytes)
+    key = hashlib.sha256(thumb).hexdigest()
+    path = _avatar_path(key)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(thumb)
+        os.replace(tmp, path)
+    return key
+
+
+@lru_cache(maxsize=AVATAR_CACHE_ENTRIES)
+def _read_avatar(key):
+    # A missing file raises, and lru_cache doesn't cache exceptions, so a key
+    # whose file appears later (e.g. saved by another process) is picked up.
+    with open(_avatar_path(key), "rb") as f:
+        return f.read()
+
+
+def load_avatar(value):
+    """
+    Image bytes for a users.avatar value, or None.
+    Keys are served from an in-process cache; legacy data URIs are decoded
+    directly (see migrate_legacy_avatar).
+    """
+    if not value:
+        return None
+    if is_avatar_key(value):
+        try:
+            return _read_avatar(value)
+        except OSError:
+            return None
+    if value.startswith("data:") and "," in value:
+        try:
+            return base64.b64decode(value.split(",", 1)[1])
+        except ValueError:
+            return None
+    return None
+
+
+def migrate_legacy_avatar(value):
+    """
+    Convert a legacy base64 data-URI avatar to a store key.
+    Returns the key, or None if ``value`` is not a convertible data URI.
+    """
+    if not value or is_avatar_key(value):
+        return None
+    raw = load_avatar(value)
+    if raw is None:
+        return None
+    try:
+        return save_avatar(raw)
+    except ValueError:
+        return None
@@ -0,0 +1,112 @@
+"""
+Shared helpers for the EmoRecs benchmark scripts.
+Puts the repository root on sys.path so the app modules import as usual.
+"""
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def percentile(sorted_samples, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    idx = min(len(sorted_samples) - 1, max(0, int(round(pct / 100.0 * len(sorted_samples))) - 1))
+    return sorted_samples[idx]
+
+
+def summarize(samples_ms):
+    """Return mean/p50/p95/p99 (milliseconds) for a list of timings."""
+    ordered = sorted(samples_ms)
+    return {
+        "n": len(ordered),
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+    }
+
+
+def print_table(rows, title=None):
+    """Print ``{name: summarize(...)}`` rows as an aligned table."""
+    if title:
+        print(f"\n{title}")
+    print(f"{'case':<32}{'n':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}   (ms)")
+    for name, st in rows.items():
+        print(f"{name:<32}{st['n']:>7}{st['mean']:>10.2f}{st['p50']:>10.2f}"
+              f"{st['p95']:>10.2f}{st['p99']:>10.2f}")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:          # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def time_calls(fn, runs, warmup=3):
+    """Call ``fn()`` ``warmup + runs`` times and return the timed runs in ms."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return samples
+
+
+def load_face_crops(paths, count, size=(160, 160)):
+    """BGR face crops read from ``paths``, or random ones when none are given."""
+    import cv2
+    import numpy as np
+
+    crops = []
+    for path in paths or []:
+        img = cv2.imread(path)
+        if img is None:
+            raise SystemExit(f"Could not read image: {path}")
+        crops.append(img)
+    if not crops:
+        rng = np.random.default_rng(0)
+        crops = [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+    while len(crops) < count:
+        crops.extend(crops[:count - len(crops)])
+    return crops[:count]
+
+
+def load_frames(video=None, images=None, count=100, size=(640, 480)):
+    """
+    Up to ``count`` BGR frames from a video file or image list, held in memory
+    so every case runs on the same pixels. Falls back to synthetic noise.
+    """
+    import cv2
+    import numpy as np
+
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(video)
+        if not cap.isOpened():
+            raise SystemExit(f"Could not open video: {video}")
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    for path in images or []:
+        img = cv2.imread(path)
+        if img is None:
+            raise SystemExit(f"Could not read image: {path}")
+        frames.append(img)
+    if not frames:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+    return frames[:count]
@@ -0,0 +1,113 @@
+"""
+Read latency of the per-user database queries as the log tables grow.
+
+Fills a scratch database in steps (activity / emotion-log rows spread over
+``--users`` users) and times the Dashboard / recommendation reads after
+each step. Run once as-is and once with ``--no-indexes`` to see what the
+schema migration's composite indexes buy:
+
+    python benchmarks/bench_db_reads.py --sizes 10000,100000,1000000,3000000
+    python benchmarks/bench_db_reads.py --no-indexes --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from _common import print_table, summarize, time_calls
+
+EMOTIONS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+
+def _fill(conn, start, stop, users, t0):
+    """Insert rows ``start..stop`` into the activity, emotion and session tables."""
+    def stamp(i):
+        return (t0 + timedelta(seconds=5 * i)).strftime("%Y-%m-%d %H:%M:%S")
+
+    rng = random.Random(start)
+    with conn:
+        conn.executemany(
+            "INSERT INTO user_activity (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)",
+            ((rng.randint(1, users), "emotion_detection", "Detected emotion", stamp(i))
+             for i in range(start, stop)),
+        )
+        conn.executemany(
+            "INSERT INTO emotion_logs (user_id, detected_emotion, confidence, timestamp) "
+            "VALUES (?, ?, ?, ?)",
+            ((rng.randint(1, users), rng.choice(EMOTIONS), rng.random(), stamp(i))
+             for i in range(start, stop)),
+        )
+        conn.executemany(
+            "INSERT INTO emotion_sessions (user_id, dominant_emotion, session_start) VALUES (?, ?, ?)",
+            ((rng.randint(1, users), rng.choice(EMOTIONS), stamp(i))
+             for i in range(start, stop, 50)),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        help="comma-separated row counts per log table")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--no-indexes", action="store_true",
+                        help="drop the migration's indexes to compare")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="emorecs-bench-")
+    os.environ["EMORECS_DB_PATH"] = os.path.join(workdir, "bench.db")
+    import database
+
+    conn = database.get_db_connection()
+    with database.transaction():
+        conn.executemany(
+            "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+            ((f"user{i}", f"user{i}@example.com", b"x") for i in range(1, args.users + 1)),
+        )
+    if args.no_indexes:
+        for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall():
+            conn.execute(f"DROP INDEX {name}")
+
+    try:
+        _run(database, conn, args)
+    finally:
+        database.close_db_connection()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run(database, conn, args):
+    raw = database._connect(database.DB_PATH)
+    raw.isolation_level = ""   # let `with raw:` manage the bulk-load transaction
+    rng = random.Random(0)
+    t0 = datetime(2026, 1, 1)
+    filled = 0
+    mode = "no indexes" if args.no_indexes else "indexed"
+    for size in (int(v) for v in args.sizes.split(",")):
+        _fill(raw, filled, size, args.users, t0)
+        filled = size
+        conn.execute("ANALYZE")
+        pick = lambda: rng.randint(1, args.users)
+
+        def latest_dominant():
+            # Time the query, not the read-through cache (entries would also
+            # carry over from the previous, smaller table within the TTL)
+            database.clear_caches()
+            return database.get_latest_dominant_emotion(pick())
+
+        rows = {
+            "get_user_activity(user)": summarize(time_calls(
+                lambda: database.get_user_activity(pick()), args.runs)),
+            "get_emotion_logs(user)": summarize(time_calls(
+                lambda: database.get_emotion_logs(pick()), args.runs)),
+            "get_latest_dominant_emotion": summarize(time_calls(
+                latest_dominant, args.runs)),
+        }
+        print_table(rows, title=f"{size:,} rows per log table ({mode})")
+    raw.close()
+
+
+if __name__ == "__main__":
+    main()
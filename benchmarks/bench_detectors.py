@@ -0,0 +1,67 @@
+"""
+Face detector throughput on identical frames.
+
+Runs every selected detector backend over the same in-memory frames and
+reports per-frame latency, FPS and faces found, optionally at several
+detection scales and with the search-window (ROI) mode:
+
+    python benchmarks/bench_detectors.py --video session.mp4 --frames 300
+    python benchmarks/bench_detectors.py --detector haar --detector ssd --confidence 0.6
+    python benchmarks/bench_detectors.py --scale 1.0 --scale 0.5 --roi
+"""
+import argparse
+import time
+
+from _common import load_frames, print_table, summarize
+
+import cv2
+import emotion_detection_page as edp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--video", help="video file to read frames from")
+    parser.add_argument("--image", action="append", help="still frame (repeatable)")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--detector", action="append", choices=sorted(edp.FACE_DETECTORS),
+                        help="detector to run (repeatable, default: all)")
+    parser.add_argument("--confidence", type=float, default=edp.SSD_CONFIDENCE,
+                        help="SSD confidence threshold")
+    parser.add_argument("--scale", type=float, action="append",
+                        help="detection scale (repeatable, default: 1.0)")
+    parser.add_argument("--roi", action="store_true",
+                        help="search around last frame's faces first")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.image, args.frames)
+    grays = [cv2.cvtColor(f, cv2.COLOR_BGR2GRAY) for f in frames]
+
+    rows, found = {}, {}
+    for kind in args.detector or sorted(edp.FACE_DETECTORS):
+        kwargs = {"confidence": args.confidence} if kind == "ssd" else {}
+        for scale in args.scale or [1.0]:
+            try:
+                detector = edp.RegionFaceDetector(
+                    edp.FACE_DETECTORS[kind](**kwargs), scale=scale, roi_search=args.roi)
+            except FileNotFoundError as e:
+                print(f"skipping {kind}: {e}")
+                break
+            detector.detect(frames[0], grays[0])   # warm-up
+            samples, faces = [], 0
+            for frame, gray in zip(frames, grays):
+                t0 = time.perf_counter()
+                faces += len(detector.detect(frame, gray))
+                samples.append((time.perf_counter() - t0) * 1000.0)
+            case = f"{kind}@{scale:g}" + ("+roi" if args.roi else "")
+            rows[case] = summarize(samples)
+            found[case] = faces / len(frames)
+
+    h, w = frames[0].shape[:2]
+    print_table(rows, title=f"Face detection latency ({len(frames)} frames, {w}x{h})")
+    for case, st in rows.items():
+        print(f"{case:<16} {1000.0 / st['mean'] if st['mean'] else 0:8.1f} FPS"
+              f"   {found[case]:.2f} faces/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Per-call latency of the emotion classification paths.
+
+Compares DeepFace.analyze (``_analyse_emotion``) with the lean direct-model
+path (``_predict_emotion``) and the batched path on the same crops, for the
+plain Keras model and the tf.function-compiled one. Also reports the first
+(cold) call that warm-up now absorbs:
+
+    python benchmarks/bench_emotion_predict.py --runs 200
+    python benchmarks/bench_emotion_predict.py --image face.jpg --faces 4
+    python benchmarks/bench_emotion_predict.py --intra 4 --inter 1 --jit
+
+TF thread pools can only be sized once per process, so ``--sweep`` re-runs
+the script per intra-op thread count and prints steady-state cost per face:
+
+    python benchmarks/bench_emotion_predict.py --sweep 1,2,4,8,16 --faces 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from _common import load_face_crops, print_table, summarize, time_calls
+
+import emotion_detection_page as edp
+
+
+def _cold_call_ms(model, crop):
+    t0 = time.perf_counter()
+    edp._predict_emotion(model, crop)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def _sweep(args):
+    print(f"{'intra threads':>14}{'1 face p50':>14}{'batch p50':>14}{'per face':>12}   (ms)")
+    for intra in args.sweep.split(","):
+        cmd = [sys.executable, os.path.abspath(__file__), "--intra", intra,
+               "--inter", str(args.inter), "--runs", str(args.runs),
+               "--faces", str(args.faces), "--compiled-only", "--machine"]
+        if args.jit:
+            cmd.append("--jit")
+        for image in args.image or []:
+            cmd += ["--image", image]
+        out = subprocess.run(cmd, capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f"{intra:>14}   failed: {out.stderr.strip().splitlines()[-1:]}")
+            continue
+        single, batch = (float(v) for v in out.stdout.strip().splitlines()[-1].split())
+        print(f"{intra:>14}{single:>14.2f}{batch:>14.2f}{batch / args.faces:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", action="append", help="face crop image (repeatable)")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--faces", type=int, default=3, help="crops per batched call")
+    parser.add_argument("--intra", type=int, default=edp.TF_INTRA_OP_THREADS,
+                        help="TF intra-op threads (0 = TF default)")
+    parser.add_argument("--inter", type=int, default=edp.TF_INTER_OP_THREADS,
+                        help="TF inter-op threads (0 = TF default)")
+    parser.add_argument("--jit", action="store_true", help="XLA-compile the tf.function")
+    parser.add_argument("--sweep", help="comma-separated intra-op thread counts")
+    parser.add_argument("--compiled-only", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--machine", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.sweep:
+        _sweep(args)
+        return
+
+    edp._configure_tf_runtime(args.intra, args.inter)
+    from deepface import DeepFace
+
+    crops = load_face_crops(args.image, max(1, args.faces))
+    crop = crops[0]
+
+    compiled = edp.CompiledEmotionNet(edp._emotion_network(DeepFace, compiled=False),
+                                      jit_compile=args.jit)
+    cold = _cold_call_ms(compiled, crop)
+    edp._warm_up_model(compiled)
+
+    if args.machine:
+        single = summarize(time_calls(lambda: edp._predict_emotion(compiled, crop), args.runs))
+        batch = summarize(time_calls(lambda: edp._classify_faces_batch(compiled, crops), args.runs))
+        print(f"{single['p50']:.4f} {batch['p50']:.4f}")
+        return
+
+    keras_model = edp._emotion_network(DeepFace, compiled=False)
+    rows = {
+        "DeepFace.analyze (1 face)": summarize(
+            time_calls(lambda: edp._analyse_emotion(DeepFace, crop), args.runs)),
+        "keras predict (1 face)": summarize(
+            time_calls(lambda: edp._predict_emotion(keras_model, crop), args.runs)),
+        "tf.function (1 face)": summarize(
+            time_calls(lambda: edp._predict_emotion(compiled, crop), args.runs)),
+        f"keras batched ({len(crops)} faces)": summarize(
+            time_calls(lambda: edp._classify_faces_batch(keras_model, crops), args.runs)),
+        f"tf.function batched ({len(crops)})": summarize(
+            time_calls(lambda: edp._classify_faces_batch(compiled, crops), args.runs)),
+    }
+    threads = f"intra={args.intra or 'default'}, inter={args.inter or 'default'}"
+    print_table(rows, title=f"Emotion classification latency ({threads}{', XLA' if args.jit else ''})")
+
+    print(f"\nFirst call before warm-up (tracing + allocator set-up): {cold:.1f} ms")
+    saved = rows["DeepFace.analyze (1 face)"]["mean"] - rows["tf.function (1 face)"]["mean"]
+    print(f"Latency saved per call vs DeepFace.analyze: {saved:.2f} ms (mean)")
+    per_face = rows[f"tf.function batched ({len(crops)})"]["mean"] / len(crops)
+    print(f"Batched cost per face: {per_face:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Login throughput under concurrent load.
+
+Registers ``--users`` accounts in a scratch database, then has ``--clients``
+threads call ``database.login_user`` as fast as they can (like simultaneous
+Streamlit sessions) and reports logins/s and per-login latency for each
+bcrypt cost. The hashing pool size comes from EMORECS_PASSWORD_WORKERS:
+
+    python benchmarks/bench_login.py --rounds 10,12 --clients 1,4,16
+    EMORECS_PASSWORD_WORKERS=1 python benchmarks/bench_login.py --rounds 12
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from _common import print_table, summarize
+
+PASSWORD = "correct horse battery staple"
+
+
+def _login_burst(database, emails, clients, logins):
+    """``logins`` logins spread over ``clients`` threads; returns (latencies ms, wall s)."""
+    latencies = []
+    lock = threading.Lock()
+    start = threading.Barrier(clients + 1)
+    per_client = max(1, logins // clients)
+
+    def client(idx):
+        mine = []
+        start.wait()
+        for i in range(per_client):
+            t0 = time.perf_counter()
+            ok, _, message = database.login_user(emails[(idx + i) % len(emails)], PASSWORD)
+            mine.append((time.perf_counter() - t0) * 1000.0)
+            if not ok:
+                raise SystemExit(f"Login failed: {message}")
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", default="10,12", help="comma-separated bcrypt costs")
+    parser.add_argument("--clients", default="1,4,16", help="comma-separated thread counts")
+    parser.add_argument("--logins", type=int, default=64, help="logins per burst")
+    parser.add_argument("--users", type=int, default=16)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="emorecs-bench-")
+    os.environ["EMORECS_DB_PATH"] = os.path.join(workdir, "bench.db")
+    import database
+
+    try:
+        print(f"hashing workers: {database.PASSWORD_WORKERS}, cpus: {os.cpu_count()}")
+        for rounds in (int(v) for v in args.rounds.split(",")):
+            database.BCRYPT_ROUNDS = rounds
+            conn = database.get_db_connection()
+            conn.execute("DELETE FROM users")
+            emails = []
+            for i in range(args.users):
+                email = f"bench{rounds}_{i}@example.com"
+                ok, message = database.register_user(f"bench{rounds}_{i}", email, PASSWORD)
+                if not ok:
+                    raise SystemExit(message)
+                emails.append(email)
+
+            rows, rates = {}, []
+            for clients in (int(v) for v in args.clients.split(",")):
+                latencies, wall = _login_burst(database, emails, clients, args.logins)
+                rows[f"{clients} clients"] = summarize(latencies)
+                rates.append(f"{clients} clients: {len(latencies) / wall:.1f} logins/s")
+            print_table(rows, title=f"bcrypt cost {rounds}")
+            print("  " + ", ".join(rates))
+    finally:
+        database.flush_log_queue()
+        database.close_db_connection()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
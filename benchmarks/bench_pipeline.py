@@ -0,0 +1,156 @@
+"""
+Headless end-to-end benchmark of the per-frame emotion pipeline.
+
+Feeds frames from a video file, still images or a synthetic generator
+through ``EmotionPipeline`` (the same code the live page runs, minus
+Streamlit and the webcam). Reports per-stage p50/p95/p99, overall FPS and
+peak RSS, so detector, engine and batching options can be compared on a
+headless Linux box:
+
+    python benchmarks/bench_pipeline.py --video session.mp4 --frames 600
+    python benchmarks/bench_pipeline.py --synthetic-faces 3 --engine opencv
+    python benchmarks/bench_pipeline.py --video session.mp4 --detector ssd --workers 2 --no-batch
+
+``--source`` streams instead of preloading: any VideoSource (file, image
+directory, rtsp:// URL, webcam index) decoded on its own thread, the way
+recorded sessions are processed in bulk:
+
+    python benchmarks/bench_pipeline.py --source recordings/session1.mp4
+    python benchmarks/bench_pipeline.py --source rtsp://127.0.0.1:8554/cam --lag-policy drop --frames 900
+
+Synthetic frames are noise with ``--synthetic-faces`` fixed face boxes
+handed to the tracker in place of a real detector, so the classification,
+smoothing and drawing stages still get exercised.
+"""
+import argparse
+import time
+
+from _common import load_frames, peak_rss_mb, print_table, summarize
+
+import emotion_detection_page as edp
+
+
+class FixedBoxDetector:
+    """Stand-in detector returning the same boxes every frame (synthetic input)."""
+
+    name = "fixed"
+    uses_gray = False
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+    def detect(self, frame, gray=None):
+        return list(self.boxes)
+
+
+def _synthetic_boxes(count, width, height):
+    """``count`` non-overlapping face-sized boxes spread across the frame."""
+    size = min(height // 2, width // max(1, count) - 10)
+    step = width // max(1, count)
+    return [(i * step + (step - size) // 2, (height - size) // 2, size, size) for i in range(count)]
+
+
+def _stream(first, rest, limit):
+    """The first frame, then the rest of the source, up to ``limit`` frames."""
+    yield first
+    for i, frame in enumerate(rest, start=1):
+        if i >= limit:
+            return
+        yield frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--video", help="video file to read frames from")
+    parser.add_argument("--image", action="append", help="still frame (repeatable)")
+    parser.add_argument("--frames", type=int, default=300, help="frames to preload / max streamed")
+    parser.add_argument("--source", help="stream frames from a VideoSource instead of preloading")
+    parser.add_argument("--lag-policy", choices=("drop", "block"),
+                        help="VideoSource lag policy (default: drop for live, block for files)")
+    parser.add_argument("--source-fps", type=float, default=0.0,
+                        help="pace a file/image source to this rate (0 = as fast as it decodes)")
+    parser.add_argument("--synthetic-faces", type=int, default=2,
+                        help="face boxes on synthetic frames (used without --video/--image)")
+    parser.add_argument("--detector", choices=sorted(edp.FACE_DETECTORS), default=edp.FACE_DETECTOR)
+    parser.add_argument("--scale", type=float, default=edp.DETECTION_SCALE, help="detection scale")
+    parser.add_argument("--no-roi", action="store_true", help="disable search-window detection")
+    parser.add_argument("--engine", choices=("tensorflow", "opencv"), default=edp.INFERENCE_ENGINE)
+    parser.add_argument("--no-batch", action="store_true", help="one inference call per face")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="inference threads (0 = inline, so inference time shows as a stage)")
+    parser.add_argument("--analyse-every", type=int, default=edp.ANALYSE_EVERY_N_FRAMES)
+    parser.add_argument("--render-every", type=int, default=1,
+                        help="draw + encode every Nth frame (display FPS cap)")
+    args = parser.parse_args()
+
+    video_source = None
+    if args.source:
+        video_source = edp.VideoSource(args.source, fps=args.source_fps, lag_policy=args.lag_policy)
+        if not video_source.open():
+            raise SystemExit(f"Could not open source: {args.source}")
+        stream = video_source.start().frames()
+        first = next(stream, None)
+        if first is None:
+            raise SystemExit(f"No frames from source: {args.source}")
+        frames = _stream(first, stream, args.frames)
+        h, w = first.shape[:2]
+    else:
+        frames = load_frames(args.video, args.image, args.frames)
+        h, w = frames[0].shape[:2]
+    synthetic = not (args.video or args.image or args.source)
+    if synthetic:
+        detector = FixedBoxDetector(_synthetic_boxes(args.synthetic_faces, w, h))
+        source = f"synthetic, {args.synthetic_faces} faces"
+    else:
+        # Not build_face_detector: its silent Haar fallback would mislabel the run
+        try:
+            detector = edp.FACE_DETECTORS[args.detector]()
+        except FileNotFoundError as e:
+            raise SystemExit(f"Can't run the {args.detector} detector: {e}")
+        source = args.source or args.video or f"{len(args.image)} images"
+    _, _, model = edp._load_models(engine=args.engine)
+
+    executor = None
+    if args.workers:
+        from concurrent.futures import ThreadPoolExecutor
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+
+    timings = {}
+    pipeline = edp.EmotionPipeline(detector, model, executor=executor,
+                                   analyse_every=args.analyse_every,
+                                   batch=not args.no_batch, timings=timings,
+                                   # fixed boxes are already full-resolution
+                                   detection_scale=1.0 if synthetic else args.scale,
+                                   roi_search=not (synthetic or args.no_roi))
+    totals, updates, count = [], 0, 0
+    wall0 = time.perf_counter()
+    for i, frame in enumerate(frames):
+        count += 1
+        t0 = time.perf_counter()
+        _, new, _ = pipeline.process(frame, render=i % max(1, args.render_every) == 0)
+        totals.append((time.perf_counter() - t0) * 1000.0)
+        updates += len(new)
+    wall = time.perf_counter() - wall0
+    pipeline.close()
+    if executor is not None:
+        executor.shutdown(wait=True)
+    if video_source is not None:
+        video_source.stop()
+
+    rows = {stage: summarize(timings[stage]) for stage in edp.EmotionPipeline.STAGES if stage in timings}
+    rows["frame total"] = summarize(totals)
+    mode = f"{args.workers} workers" if args.workers else "inline"
+    detector_name = "fixed boxes" if synthetic else f"{detector.name}@{args.scale:g}"
+    print_table(rows, title=(f"Pipeline stages ({count} frames {w}x{h}, {source}; "
+                             f"{detector_name}, {type(model).__name__}, "
+                             f"{'per-face' if args.no_batch else 'batched'}, {mode})"))
+    rss = peak_rss_mb()
+    print(f"\nFPS: {count / wall:.1f}   emotion updates: {updates}   "
+          f"peak RSS: {f'{rss:.0f} MB' if rss is not None else 'n/a'}")
+    if video_source is not None:
+        print(f"source: {video_source.kind}, lag policy {video_source.lag_policy}, "
+              f"frames skipped for lag: {video_source.dropped}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Parity, latency and memory: TensorFlow vs OpenCV (ONNX) emotion engines.
+
+Each engine runs in its own interpreter, so peak RSS and start-up time
+include everything that engine imports. The OpenCV engine's scores are
+checked against the TensorFlow engine and against DeepFace.analyze on
+the same crops. Exits non-zero if the two engines disagree beyond the
+tolerance. Needs models/emotion_fer.onnx (python export_emotion_onnx.py):
+
+    python benchmarks/compare_inference_engines.py
+    python benchmarks/compare_inference_engines.py --image a.jpg --image b.jpg --runs 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from _common import load_face_crops, peak_rss_mb, summarize, time_calls
+
+ENGINES = ("tensorflow", "opencv")
+
+
+def _worker(args):
+    """Child process: load one engine, time it, print a JSON report."""
+    t0 = time.perf_counter()
+    import emotion_detection_page as edp
+
+    _, deepface, model = edp._load_models(engine=args.worker)
+    load_s = time.perf_counter() - t0
+    crops = load_face_crops(args.image, max(1, args.faces))
+
+    report = {
+        "engine": type(model).__name__,
+        "tensorflow_imported": "tensorflow" in sys.modules,
+        "load_s": load_s,
+        "single": summarize(time_calls(lambda: edp._predict_emotion(model, crops[0]), args.runs)),
+        "batch": summarize(time_calls(lambda: edp._classify_faces_batch(model, crops), args.runs)),
+        "scores": [r[2] for r in edp._classify_faces_batch(model, crops)],
+    }
+    if deepface is not None:
+        report["analyze_scores"] = [
+            {k: float(v) for k, v in edp._analyse_emotion(deepface, c)[2].items()} for c in crops
+        ]
+    report["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(report))
+
+
+def _max_diff(a, b):
+    """Largest score difference (percentage points) and dominant-label agreement."""
+    diff, agree = 0.0, 0
+    for sa, sb in zip(a, b):
+        if not sa or not sb:
+            continue
+        diff = max(diff, max(abs(sa[k] - sb.get(k, 0.0)) for k in sa))
+        agree += max(sa, key=sa.get) == max(sb, key=sb.get)
+    return diff, agree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", action="append", help="face crop image (repeatable)")
+    parser.add_argument("--faces", type=int, default=8, help="crops compared / batched")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="max score difference between engines, percentage points")
+    parser.add_argument("--worker", choices=ENGINES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(args)
+        return
+
+    reports = {}
+    for engine in ENGINES:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", engine,
+               "--faces", str(args.faces), "--runs", str(args.runs)]
+        for image in args.image or []:
+            cmd += ["--image", image]
+        env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL="3")
+        proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+        if proc.returncode != 0:
+            sys.exit(f"{engine} worker failed:\n{proc.stderr[-2000:]}")
+        reports[engine] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    print(f"{'engine':<12}{'runs as':<22}{'TF loaded':>10}{'start (s)':>11}"
+          f"{'1 face p50':>12}{'batch p50':>11}{'peak RSS MB':>13}")
+    for engine, r in reports.items():
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "n/a"
+        print(f"{engine:<12}{r['engine']:<22}{str(r['tensorflow_imported']):>10}{r['load_s']:>11.2f}"
+              f"{r['single']['p50']:>12.2f}{r['batch']['p50']:>11.2f}{rss:>13}")
+    if reports["opencv"]["engine"] != "OpenCVEmotionNet":
+        sys.exit("\nOpenCV engine fell back to TensorFlow - export models/emotion_fer.onnx first.")
+
+    n = len(reports["opencv"]["scores"])
+    diff, agree = _max_diff(reports["opencv"]["scores"], reports["tensorflow"]["scores"])
+    print(f"\nopencv vs tensorflow engine: max diff {diff:.4f} pts, same dominant {agree}/{n}")
+    analyze = reports["tensorflow"].get("analyze_scores")
+    if analyze:
+        a_diff, a_agree = _max_diff(reports["opencv"]["scores"], analyze)
+        print(f"opencv vs DeepFace.analyze:  max diff {a_diff:.4f} pts, same dominant {a_agree}/{n}"
+              "  (analyze re-detects and resizes the crop itself)")
+    if diff > args.tolerance:
+        sys.exit(f"Parity check failed: {diff:.4f} > {args.tolerance} percentage points")
+    print("Parity check passed.")
+
+
+if __name__ == "__main__":
+    main()
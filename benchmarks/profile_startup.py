@@ -0,0 +1,94 @@
+"""
+Cold-start profile: what each import on the app's startup path costs.
+
+Every module is imported in a fresh interpreter with ``python -X importtime``
+so nothing is shared between measurements. Prints the cumulative import
+time per module, the heaviest sub-imports of ``--detail`` and the time
+the first database connection spends creating/migrating the schema:
+
+    python benchmarks/profile_startup.py
+    python benchmarks/profile_startup.py --detail emotion_detection_page --top 25
+"""
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from _common import REPO_ROOT
+
+# In the order app.py reaches them: always, then per page
+MODULES = [
+    "streamlit",
+    "streamlit_option_menu",
+    "database",
+    "avatar_store",
+    "pandas",
+    "cv2",
+    "emotion_detection_page",
+    "deepface.DeepFace",
+]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _importtime(statement, env):
+    """[(self_us, cumulative_us, depth, module)] for one fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1:]
+    entries = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            entries.append((int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2, m.group(4)))
+    return entries, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", default=",".join(MODULES))
+    parser.add_argument("--detail", default="database",
+                        help="module whose heaviest sub-imports are listed")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="emorecs-startup-")
+    env = dict(os.environ, EMORECS_DB_PATH=os.path.join(workdir, "startup.db"),
+               EMORECS_WARMUP="0", TF_CPP_MIN_LOG_LEVEL="3")
+
+    print(f"{'module':<28}{'import (ms)':>14}")
+    for name in args.modules.split(","):
+        entries, error = _importtime(f"import {name}", env)
+        if entries is None:
+            print(f"{name:<28}{'failed':>14}   {' '.join(error)}")
+            continue
+        total = sum(cum for _, cum, depth, _ in entries if depth == 0)
+        print(f"{name:<28}{total / 1000:>14.1f}")
+
+    entries, error = _importtime(f"import {args.detail}", env)
+    if entries:
+        print(f"\nheaviest imports under {args.detail} (self time)")
+        print(f"{'module':<48}{'self (ms)':>12}{'cumulative':>12}")
+        for self_us, cum_us, _, name in sorted(entries, reverse=True)[:args.top]:
+            print(f"{name:<48}{self_us / 1000:>12.1f}{cum_us / 1000:>12.1f}")
+
+    code = ("import time, database; t0 = time.perf_counter(); database.get_db_connection(); "
+            "print((time.perf_counter() - t0) * 1000)")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode == 0:
+        print(f"\nfirst database connection (schema init): {float(proc.stdout.split()[-1]):.1f} ms")
+    else:
+        print(f"\nfirst database connection failed: {proc.stderr.strip().splitlines()[-1:]}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,465 @@ Handles user authentication, data storage, and admin functions
 import sqlite3
 import bcrypt
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+import atexit
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
 
-# Database file path
-DB_PATH = "emorecs.db"
+# Database file path (EMORECS_DB_PATH overrides it, e.g. for benchmarks)
+DB_PATH = os.environ.get("EMORECS_DB_PATH", "emorecs.db")
+
+# Connections come from a process-wide pool. A thread leases one on first use
+# and hands it back when the thread exits - Streamlit runs every rerun on a new
+# ScriptRunner thread, so the next rerun picks up the same open connection
+# (PRAGMAs applied, compiled statements still cached) instead of reconnecting.
+STATEMENT_CACHE_SIZE = 128
+BUSY_TIMEOUT = 10.0
+POOL_SIZE = 8                    # idle connections kept for the next thread
+
+# Applied to every new connection. WAL lets readers run alongside the log
+# writers; NORMAL sync is durable across app crashes in WAL mode and avoids
+# an fsync per commit.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -32000",      # KiB, i.e. ~32 MB page cache
+    "PRAGMA mmap_size = 268435456",    # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Write-behind logging: rows queued by the camera loop are written by one
+# background thread in batches (one transaction per batch).
+LOG_QUEUE_SIZE = 10000
+LOG_FLUSH_ROWS = 200             # write once this many rows are waiting ...
+LOG_FLUSH_INTERVAL_MS = 500      # ... or this long after the first one arrived
+LOG_OVERFLOW_POLICY = "drop_oldest"   # "block", "drop_oldest" or "drop_newest"
+
+# Read-through caches for the per-user lookups app.py repeats on every rerun
+CACHE_TTL = 60.0                 # seconds before a cached entry is re-read
+CACHE_MAX_ENTRIES = 1024         # per cache, least recently used evicted first
+RECENT_ACTIVITY_LIMIT = 10       # rows kept per user by get_recent_user_activity
+
+# Password hashing runs on a small worker pool (bcrypt releases the GIL), so a
+# burst of logins can't occupy every core. Hashes with a different cost are
+# upgraded on the next successful login.
+BCRYPT_ROUNDS = int(os.environ.get("EMORECS_BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.environ.get("EMORECS_PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_QUEUE_LIMIT = 64        # hash requests waiting or running at once
+PASSWORD_WAIT_TIMEOUT = 10.0     # seconds to wait for a free slot
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized_paths = set()     # DB files whose schema is set up in this process
+_pool = []                     # idle (path, connection) pairs
+_pool_lock = threading.Lock()
+_pool_stats = {"opened": 0, "reused": 0}
+
+def _connect(path):
+    """Open a connection in autocommit mode; transactions are explicit"""
+    # Leased by one thread at a time, but returned to the pool from another
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT,
+        isolation_level=None,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        check_same_thread=False,
+    )
+    conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _acquire_connection(path):
+    """An idle pooled connection to ``path``, or a new one"""
+    with _pool_lock:
+        for i in range(len(_pool) - 1, -1, -1):
+            if _pool[i][0] == path:
+                _pool_stats["reused"] += 1
+                return _pool.pop(i)[1]
+        _pool_stats["opened"] += 1
+    return _connect(path)
+
+def _release_connection(path, conn):
+    """Put a connection back in the pool (closed if the pool is full or stale)"""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        with _pool_lock:
+            if path == DB_PATH and len(_pool) < POOL_SIZE:
+                _pool.append((path, conn))
+                return
+        conn.close()
+    except Exception:
+        pass   # interpreter shutdown, or the connection is already broken
+
+class _Lease:
+    """A thread's pooled connection; released when the thread's locals are freed"""
+
+    __slots__ = ("path", "conn")
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = _acquire_connection(path)
+
+    def __del__(self):
+        if self.conn is not None:
+            _release_connection(self.path, self.conn)
+            self.conn = None
+
+def get_db_connection():
+    """
+    Get this thread's database connection, leasing one from the pool on
+    first use. It is reused by every call on the thread and returned to the
+    pool when the thread exits - don't close it.
+    """
+    lease = getattr(_local, "lease", None)
+    if lease is None or lease.conn is None or lease.path != DB_PATH:
+        lease = _local.lease = _Lease(DB_PATH)
+    conn = lease.conn
+    if DB_PATH not in _initialized_paths and not getattr(_local, "initializing", False):
+        ensure_db()
+    return conn
+
+def ensure_db():
+    """
+    Create/migrate the schema once per process and database file.
+    Runs on the first connection, so importing this module stays cheap and
+    pages that never touch the database don't pay for it.
+    """
+    path = DB_PATH
+    if path in _initialized_paths:
+        return
+    with _init_lock:
+        if path in _initialized_paths:
+            return
+        _local.initializing = True
+        try:
+            init_db()
+        finally:
+            _local.initializing = False
+        _initialized_paths.add(path)
+
+def close_db_connection():
+    """Close this thread's connection (a new one is opened on next use)"""
+    lease = getattr(_local, "lease", None)
+    if lease is not None and lease.conn is not None:
+        lease.conn.close()
+        lease.conn = None
+
+def get_pool_stats():
+    """Connections opened vs. reused from the pool, and how many sit idle"""
+    with _pool_lock:
+        return dict(_pool_stats, idle=len(_pool))
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Run a block in one transaction on this thread's connection.
+    Commits on success and rolls back on error; nested use joins the outer
+    transaction. ``immediate`` takes the write lock up front.
+    """
+    conn = get_db_connection()
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+class TTLCache:
+    """
+    Small thread-safe TTL + LRU cache with hit/miss counters.
+    ``invalidate`` bumps a per-key generation, so a load that started
+    before the invalidation can't put its (stale) result back afterwards.
+    Invalidate after the write has committed.
+    """
+
+    def __init__(self, name, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get_or_load(self, key, loader):
+        """Cached value for ``key``, calling ``loader()`` on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generations.get(key, 0)
+        value = loader()
+        with self._lock:
+            if self._generations.get(key, 0) == generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._generations.pop(old_key, None)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            for key in self._entries:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+_profile_cache = TTLCache("user_profile")
+_dominant_emotion_cache = TTLCache("dominant_emotion")
+_recent_activity_cache = TTLCache("recent_activity")
+_CACHES = (_profile_cache, _dominant_emotion_cache, _recent_activity_cache)
+
+def get_cache_stats():
+    """Hit/miss counters per read-through cache, for tuning CACHE_TTL / size"""
+    return {cache.name: cache.stats() for cache in _CACHES}
+
+def clear_caches():
+    """Drop every cached lookup (e.g. after editing the database by hand)"""
+    for cache in _CACHES:
+        cache.clear()
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when too many password hashes are already queued"""
+
+_password_executor = None
+_password_executor_lock = threading.Lock()
+_password_slots = threading.BoundedSemaphore(PASSWORD_QUEUE_LIMIT)
+
+def _get_password_executor():
+    global _password_executor
+    if _password_executor is None:
+        with _password_executor_lock:
+            if _password_executor is None:
+                _password_executor = ThreadPoolExecutor(
+                    max_workers=PASSWORD_WORKERS, thread_name_prefix="emorecs-bcrypt"
+                )
+    return _password_executor
+
+def _run_password_task(fn, *args):
+    """Run ``fn`` on the hashing pool and wait for it, bounded by PASSWORD_QUEUE_LIMIT"""
+    if not _password_slots.acquire(timeout=PASSWORD_WAIT_TIMEOUT):
+        raise PasswordHasherBusy("Too many sign-ins at once, please try again.")
+    try:
+        return _get_password_executor().submit(fn, *args).result()
+    finally:
+        _password_slots.release()
+
+def hash_password(password, rounds=None):
+    """bcrypt hash of ``password`` at ``rounds`` (default BCRYPT_ROUNDS)"""
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    return _run_password_task(bcrypt.hashpw, password.encode('utf-8'), salt)
+
+def check_password(password, hashed):
+    """True if ``password`` matches the stored bcrypt hash"""
+    return _run_password_task(bcrypt.checkpw, password.encode('utf-8'), hashed)
+
+def bcrypt_cost(hashed):
+    """Cost factor of a stored bcrypt hash ($2b$<cost>$...), or None"""
+    try:
+        if isinstance(hashed, str):
+            hashed = hashed.encode('utf-8')
+        return int(hashed.split(b"$")[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+def _rehash_password(user_id, password, old_hash):
+    """Store a hash at the current cost, unless the password changed meanwhile"""
+    try:
+        new_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS))
+        get_db_connection().execute(
+            "UPDATE users SET password = ? WHERE id = ? AND password = ?",
+            (new_hash, user_id, old_hash),
+        )
+    except Exception as e:
+        print(f"Error upgrading password hash: {e}")
 
 def init_db():
     """Initialize the database with required tables"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+    with transaction() as conn:
+        _create_schema(conn.cursor())
+    _migrate(get_db_connection())
+    print("Database initialized successfully!")
+
+def _migration_1(cursor):
+    """Composite indexes for the per-user, newest-first queries"""
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_user_activity_user_ts ON user_activity (user_id, timestamp)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emotion_logs_user_ts ON emotion_logs (user_id, timestamp)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emotion_sessions_user_start "
+        "ON emotion_sessions (user_id, session_start)"
+    )
+
+def _migration_2(cursor):
+    """(timestamp, id) indexes for the keyset-paginated admin listings"""
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_user_activity_ts_id ON user_activity (timestamp, id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emotion_logs_ts_id ON emotion_logs (timestamp, id)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_created_id ON users (created_at, id)"
+    )
+
+# Tables whose row counts are kept in stats_counters
+COUNTED_TABLES = ("users", "user_activity", "emotion_logs")
+
+def _migration_3(cursor):
+    """
+    Row counters and per-day registrations for the admin stats, seeded
+    from the existing rows and kept current by triggers, so they commit
+    (or roll back) together with the insert/delete that changed them.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_registrations (
+            day TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    for table in COUNTED_TABLES:
+        cursor.execute(
+            f"INSERT OR REPLACE INTO stats_counters (name, value) "
+            f"SELECT '{table}', COUNT(*) FROM {table}"
+        )
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE stats_counters SET value = value + 1 WHERE name = '{table}';
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE stats_counters SET value = value - 1 WHERE name = '{table}';
+            END
+        """)
+
+    cursor.execute("""
+        INSERT OR REPLACE INTO daily_registrations (day, count)
+        SELECT date(created_at), COUNT(*) FROM users
+        WHERE created_at IS NOT NULL
+        GROUP BY date(created_at)
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_daily_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO daily_registrations (day, count)
+            VALUES (COALESCE(date(NEW.created_at), date('now')), 1)
+            ON CONFLICT (day) DO UPDATE SET count = count + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_users_daily_delete AFTER DELETE ON users
+        WHEN OLD.created_at IS NOT NULL
+        BEGIN
+            UPDATE daily_registrations SET count = count - 1 WHERE day = date(OLD.created_at);
+        END
+    """)
+
+# Rollup granularity -> (table, strftime bucket format)
+ROLLUP_TABLES = {
+    "hour": ("emotion_rollups_hourly", "%Y-%m-%d %H:00:00"),
+    "day": ("emotion_rollups_daily", "%Y-%m-%d"),
+}
+
+def _migration_4(cursor):
+    """
+    Per-user / per-emotion hourly and daily rollups of emotion_logs.
+    rollup_state holds the highest emotion_logs id already aggregated;
+    the tables start empty and are filled by refresh_emotion_rollups().
+    """
+    for table, _ in ROLLUP_TABLES.values():
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                emotion TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                confidence_sum REAL NOT NULL DEFAULT 0,
+                confidence_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, user_id, emotion)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_user ON {table} (user_id, bucket)"
+        )
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("INSERT OR IGNORE INTO rollup_state (name, last_id) VALUES ('emotion_logs', 0)")
+
+# (schema version, step) - append new steps, never edit applied ones
+MIGRATIONS = [
+    (1, _migration_1),
+    (2, _migration_2),
+    (3, _migration_3),
+    (4, _migration_4),
+]
+
+def _migrate(conn):
+    """
+    Bring the schema up to the latest version recorded in PRAGMA user_version.
+    Each step runs in its own write transaction and re-checks the version,
+    so two processes starting at once don't apply a step twice.
+    """
+    # journal_mode is stored in the file and can't change inside a transaction
+    conn.execute("PRAGMA journal_mode = WAL")
+    for version, step in MIGRATIONS:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+            continue
+        with transaction(immediate=True):
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+            step(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+
+def _create_schema(cursor):
+    """Create the tables (and older-schema columns) if they don't exist"""
     # Users table - Create if not exists to preserve existing data
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -73,16 +522,6 @@ def init_db():
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
-    print("Database initialized successfully!")
-
-def get_db_connection():
-    """Get a database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
 
 def register_user(username, email, password):
     """
@@ -90,45 +529,100 @@ def register_user(username, email, password):
     Returns: (success: bool, message: str)
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if username already exists
-        cursor.execute("SELECT username FROM users WHERE username = ?", (username,))
-        if cursor.fetchone():
-            conn.close()
-            return False, "Username already exists!"
-        
-        # Check if email already exists
-        cursor.execute("SELECT email FROM users WHERE email = ?", (email,))
-        if cursor.fetchone():
-            conn.close()
-            return False, "Email already registered!"
-        
-        # Hash the password
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        
-        # Insert new user
-        cursor.execute(
-            "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
-            (username, email, hashed_password)
-        )
-        user_id = cursor.lastrowid
+        # Hash first so the write lock isn't held during bcrypt
+        hashed_password = hash_password(password)
         
-        # Log the registration activity
-        cursor.execute(
-            "INSERT INTO user_activity (user_id, action, details) VALUES (?, ?, ?)",
-            (user_id, "register", f"User registered: {username}")
-        )
-        
-        conn.commit()
-        conn.close()
+        # One write transaction; the UNIQUE constraints reject duplicates,
+        # so there's no check-then-insert race between concurrent signups
+        with transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            
+            # Insert new user
+            cursor.execute(
+                "INSERT INTO users (username, email, password) VALUES (?, ?, ?)",
+                (username, email, hashed_password)
+            )
+            user_id = cursor.lastrowid
+            
+            # Log the registration activity
+            cursor.execute(
+                "INSERT INTO user_activity (user_id, action, details) VALUES (?, ?, ?)",
+                (user_id, "register", f"User registered: {username}")
+            )
         
         return True, "Account created successfully!"
         
+    except sqlite3.IntegrityError as e:
+        return False, _duplicate_user_message(e, username)
+    except PasswordHasherBusy as e:
+        return False, str(e)
     except Exception as e:
         return False, f"Error: {str(e)}"
 
+def _duplicate_user_message(error, username):
+    """User-facing message for a UNIQUE violation on users"""
+    text = str(error)
+    if "users.username" in text:
+        return "Username already exists!"
+    if "users.email" in text:
+        # SQLite reports one violation; keep the old username-first precedence
+        taken = get_db_connection().execute(
+            "SELECT 1 FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return "Username already exists!" if taken else "Email already registered!"
+    return f"Error: {text}"
+
+IMPORT_BATCH_SIZE = 5000
+
+def import_users(users, rounds=None, batch_size=IMPORT_BATCH_SIZE, reuse_hashes=False):
+    """
+    Bulk-insert accounts, e.g. to seed a load-test database.
+    ``users`` is an iterable of (username, email, password) tuples; a
+    password that is already a bcrypt hash (bytes starting with b"$2") is
+    stored as-is. Passwords are hashed at ``rounds`` (default BCRYPT_ROUNDS -
+    pass 4 for fast seeding) on a thread pool of the import's own, so a big
+    import never queues ahead of interactive logins on the login pool. With
+    ``reuse_hashes`` identical passwords share one hash (test data only).
+    Rows whose username or email already exist are skipped.
+    Returns: (inserted: int, skipped: int)
+    """
+    salt_rounds = rounds or BCRYPT_ROUNDS
+    hashes = {}
+
+    def is_hash(password):
+        return isinstance(password, bytes) and password.startswith(b"$2")
+
+    def hashed(password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(salt_rounds))
+
+    inserted = skipped = 0
+    rows = iter(users)
+    with ThreadPoolExecutor(max_workers=PASSWORD_WORKERS,
+                            thread_name_prefix="emorecs-bcrypt-import") as executor:
+        while True:
+            batch = [row for _, row in zip(range(batch_size), rows)]
+            if not batch:
+                break
+            plain = [password for _, _, password in batch if not is_hash(password)]
+            if reuse_hashes:
+                todo = list(dict.fromkeys(p for p in plain if p not in hashes))
+                hashes.update(zip(todo, executor.map(hashed, todo)))
+                fresh = (hashes[p] for p in plain)
+            else:
+                fresh = executor.map(hashed, plain)   # results in input order
+            passwords = [
+                password if is_hash(password) else next(fresh)
+                for _, _, password in batch
+            ]
+            with transaction(immediate=True) as conn:
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO users (username, email, password) VALUES (?, ?, ?)",
+                    ((username, email, pw) for (username, email, _), pw in zip(batch, passwords)),
+                )
+                inserted += cursor.rowcount
+            skipped += len(batch) - cursor.rowcount
+    return inserted, skipped
+
 def login_user(email, password):
     """
     Authenticate user with email and password
@@ -143,18 +637,22 @@ def login_user(email, password):
         user = cursor.fetchone()
         
         if not user:
-            conn.close()
             return False, None, "Email not found!"
         
         # Verify password
-        if bcrypt.checkpw(password.encode('utf-8'), user['password']):
+        if check_password(password, user['password']):
+            # Upgrade hashes made at another cost, in the background
+            if bcrypt_cost(user['password']) != BCRYPT_ROUNDS:
+                _get_password_executor().submit(
+                    _rehash_password, user['id'], password, user['password']
+                )
+
             # Log the login activity
             cursor.execute(
                 "INSERT INTO user_activity (user_id, action, details) VALUES (?, ?, ?)",
                 (user['id'], "login", f"User logged in: {user['username']}")
             )
-            conn.commit()
-            conn.close()
+            _recent_activity_cache.invalidate(user['id'])
             
             user_data = {
                 'id': user['id'],
@@ -164,9 +662,10 @@ def login_user(email, password):
             }
             return True, user_data, "Login successful!"
         else:
-            conn.close()
             return False, None, "Incorrect password!"
             
+    except PasswordHasherBusy as e:
+        return False, None, str(e)
     except Exception as e:
         return False, None, f"Error: {str(e)}"
 
@@ -183,120 +682,236 @@ def log_emotion_detection(user_id, emotion, confidence, recommendation_type=None
             (user_id, emotion, confidence, recommendation_type, recommendation_item)
         )
         
-        conn.commit()
-        conn.close()
         return True
     except Exception as e:
         print(f"Error logging emotion: {e}")
         return False
 
-def get_all_users():
-    """Get all registered users (for admin view)"""
+PAGE_SIZE = 50
+STREAM_BATCH_SIZE = 500
+
+def _keyset_rows(select, alias, sort_col, user_id=None, limit=None, before=None):
+    """
+    Newest-first rows for ``select`` (aliased as ``alias``), ordered on
+    (sort_col, id). ``before`` is the cursor of the last row of the previous
+    page: rows strictly after it in that order are returned, so each page is
+    an index range scan however deep into the table it is.
+    """
+    where, params = [], []
+    if user_id:
+        where.append(f"{alias}.user_id = ?")
+        params.append(user_id)
+    if before is not None:
+        where.append(f"({alias}.{sort_col}, {alias}.id) < (?, ?)")
+        params.extend(before)
+    sql = select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {alias}.{sort_col} DESC, {alias}.id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    cursor = get_db_connection().execute(sql, params)
+    return [dict(row) for row in cursor.fetchall()]
+
+def _stream(fetch, sort_col, batch_size):
+    """Yield rows from a keyset ``fetch(limit, before)`` one page at a time"""
+    before = None
+    while True:
+        rows = fetch(batch_size, before)
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        before = page_cursor(rows, sort_col)
+
+def page_cursor(rows, sort_col="timestamp"):
+    """Cursor for the page after ``rows`` (None when ``rows`` is empty)"""
+    if not rows:
+        return None
+    last = rows[-1]
+    return (last[sort_col], last["id"])
+
+_USERS_SELECT = "SELECT u.id, u.username, u.email, u.created_at FROM users u"
+_ACTIVITY_SELECT = """SELECT ua.*, u.username
+    FROM user_activity ua
+    JOIN users u ON ua.user_id = u.id"""
+_EMOTION_LOGS_SELECT = """SELECT el.*, u.username
+    FROM emotion_logs el
+    JOIN users u ON el.user_id = u.id"""
+
+def get_all_users(limit=None, before=None):
+    """
+    Get registered users (for admin view), newest first.
+    Pass ``limit`` and the ``page_cursor(rows, "created_at")`` of the previous
+    page as ``before`` to page through them.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, username, email, created_at 
-            FROM users 
-            ORDER BY created_at DESC
-        """)
-        users = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in users]
+        return _keyset_rows(_USERS_SELECT, "u", "created_at", limit=limit, before=before)
     except Exception as e:
         print(f"Error getting users: {e}")
         return []
 
-def get_user_activity(user_id=None):
-    """Get user activity logs"""
+def get_user_activity(user_id=None, limit=None, before=None):
+    """Get user activity logs, newest first (``before`` = ``page_cursor`` of the previous page)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if user_id:
-            cursor.execute("""
-                SELECT ua.*, u.username 
-                FROM user_activity ua
-                JOIN users u ON ua.user_id = u.id
-                WHERE ua.user_id = ?
-                ORDER BY ua.timestamp DESC
-            """, (user_id,))
-        else:
-            cursor.execute("""
-                SELECT ua.*, u.username 
-                FROM user_activity ua
-                JOIN users u ON ua.user_id = u.id
-                ORDER BY ua.timestamp DESC
-            """)
-        
-        activities = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in activities]
+        return _keyset_rows(_ACTIVITY_SELECT, "ua", "timestamp", user_id, limit, before)
     except Exception as e:
         print(f"Error getting activity: {e}")
         return []
 
-def get_emotion_logs(user_id=None):
-    """Get emotion detection logs"""
+def get_emotion_logs(user_id=None, limit=None, before=None):
+    """Get emotion detection logs, newest first (``before`` = ``page_cursor`` of the previous page)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if user_id:
-            cursor.execute("""
-                SELECT el.*, u.username 
-                FROM emotion_logs el
-                JOIN users u ON el.user_id = u.id
-                WHERE el.user_id = ?
-                ORDER BY el.timestamp DESC
-            """, (user_id,))
-        else:
-            cursor.execute("""
-                SELECT el.*, u.username 
-                FROM emotion_logs el
-                JOIN users u ON el.user_id = u.id
-                ORDER BY el.timestamp DESC
-            """)
-        
-        logs = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in logs]
+        return _keyset_rows(_EMOTION_LOGS_SELECT, "el", "timestamp", user_id, limit, before)
     except Exception as e:
         print(f"Error getting emotion logs: {e}")
         return []
 
+def iter_all_users(batch_size=STREAM_BATCH_SIZE):
+    """Stream every user without holding them all in memory"""
+    return _stream(lambda limit, before: get_all_users(limit, before), "created_at", batch_size)
+
+def iter_user_activity(user_id=None, batch_size=STREAM_BATCH_SIZE):
+    """Stream activity rows newest first, one keyset page per query"""
+    return _stream(lambda limit, before: get_user_activity(user_id, limit, before),
+                   "timestamp", batch_size)
+
+def iter_emotion_logs(user_id=None, batch_size=STREAM_BATCH_SIZE):
+    """Stream emotion log rows newest first, one keyset page per query"""
+    return _stream(lambda limit, before: get_emotion_logs(user_id, limit, before),
+                   "timestamp", batch_size)
+
+ROLLUP_BATCH_ROWS = 100000       # raw rows folded in per refresh transaction
+
+def refresh_emotion_rollups(max_rows=None):
+    """
+    Fold emotion_logs rows newer than the high-water mark into the hourly
+    and daily rollups. Each step aggregates an id range and advances the
+    mark in the same transaction, so it's safe to call from anywhere and
+    costs one indexed lookup when there's nothing new.
+    Returns the number of raw rows aggregated.
+    """
+    conn = get_db_connection()
+    # Read-only check first so an up-to-date refresh doesn't take the write lock
+    last_id = conn.execute("SELECT last_id FROM rollup_state WHERE name = 'emotion_logs'").fetchone()[0]
+    newest = conn.execute("SELECT MAX(id) FROM emotion_logs").fetchone()[0]
+    if newest is None or newest <= last_id:
+        return 0
+    total = 0
+    while max_rows is None or total < max_rows:
+        step = ROLLUP_BATCH_ROWS if max_rows is None else min(ROLLUP_BATCH_ROWS, max_rows - total)
+        with transaction(immediate=True):
+            last_id = conn.execute(
+                "SELECT last_id FROM rollup_state WHERE name = 'emotion_logs'"
+            ).fetchone()[0]
+            upper = conn.execute(
+                "SELECT MAX(id), COUNT(*) FROM (SELECT id FROM emotion_logs WHERE id > ? ORDER BY id LIMIT ?)",
+                (last_id, step),
+            ).fetchone()
+            if not upper[1]:
+                break
+            for table, bucket_format in ROLLUP_TABLES.values():
+                conn.execute(f"""
+                    INSERT INTO {table}
+                        (bucket, user_id, emotion, count, confidence_sum, confidence_count)
+                    SELECT strftime('{bucket_format}', timestamp), user_id, detected_emotion,
+                           COUNT(*), TOTAL(confidence), COUNT(confidence)
+                    FROM emotion_logs
+                    WHERE id > ? AND id <= ? AND user_id IS NOT NULL
+                    GROUP BY 1, 2, 3
+                    ON CONFLICT (bucket, user_id, emotion) DO UPDATE SET
+                        count = count + excluded.count,
+                        confidence_sum = confidence_sum + excluded.confidence_sum,
+                        confidence_count = confidence_count + excluded.confidence_count
+                """, (last_id, upper[0]))
+            conn.execute(
+                "UPDATE rollup_state SET last_id = ? WHERE name = 'emotion_logs'", (upper[0],)
+            )
+        total += upper[1]
+    return total
+
+def _rollup_filters(user_id, since, until):
+    where, params = [], []
+    if user_id:
+        where.append("user_id = ?")
+        params.append(user_id)
+    if since:
+        where.append("bucket >= ?")
+        params.append(since)
+    if until:
+        where.append("bucket < ?")
+        params.append(until)
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+def get_emotion_trend(user_id=None, granularity="day", since=None, until=None):
+    """
+    Emotion counts per time bucket from the rollups (all users when
+    ``user_id`` is None). ``since``/``until`` are bucket strings, e.g.
+    '2026-01-01' for days or '2026-01-01 13:00:00' for hours.
+    Returns: [{bucket, emotion, count, mean_confidence}] oldest first
+    """
+    table, _ = ROLLUP_TABLES[granularity]
+    try:
+        refresh_emotion_rollups()
+        where, params = _rollup_filters(user_id, since, until)
+        cursor = get_db_connection().execute(f"""
+            SELECT bucket, emotion, SUM(count) AS count,
+                   SUM(confidence_sum) / NULLIF(SUM(confidence_count), 0) AS mean_confidence
+            FROM {table}{where}
+            GROUP BY bucket, emotion
+            ORDER BY bucket, emotion
+        """, params)
+        return [dict(row) for row in cursor.fetchall()]
+    except Exception as e:
+        print(f"Error getting emotion trend: {e}")
+        return []
+
+def get_emotion_distribution(user_id=None, since=None, until=None):
+    """
+    Total detections per emotion from the daily rollups, e.g. a user's mix
+    over the last week for recommendations.
+    Returns: {emotion: {"count": int, "mean_confidence": float or None}}
+    """
+    try:
+        refresh_emotion_rollups()
+        where, params = _rollup_filters(user_id, since, until)
+        cursor = get_db_connection().execute(f"""
+            SELECT emotion, SUM(count) AS count,
+                   SUM(confidence_sum) / NULLIF(SUM(confidence_count), 0) AS mean_confidence
+            FROM emotion_rollups_daily{where}
+            GROUP BY emotion
+            ORDER BY count DESC
+        """, params)
+        return {row["emotion"]: {"count": row["count"], "mean_confidence": row["mean_confidence"]}
+                for row in cursor.fetchall()}
+    except Exception as e:
+        print(f"Error getting emotion distribution: {e}")
+        return {}
+
 def get_database_stats():
-    """Get database statistics for admin view"""
+    """
+    Get database statistics for admin view.
+    Reads the trigger-maintained counters instead of counting rows.
+    """
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        stats = {}
+        cursor.execute("SELECT name, value FROM stats_counters")
+        counters = dict(cursor.fetchall())
         
-        # Total users
-        cursor.execute("SELECT COUNT(*) FROM users")
-        stats['total_users'] = cursor.fetchone()[0]
-        
-        # Total activities
-        cursor.execute("SELECT COUNT(*) FROM user_activity")
-        stats['total_activities'] = cursor.fetchone()[0]
-        
-        # Total emotion logs
-        cursor.execute("SELECT COUNT(*) FROM emotion_logs")
-        stats['total_emotion_logs'] = cursor.fetchone()[0]
+        stats = {}
+        stats['total_users'] = counters.get('users', 0)
+        stats['total_activities'] = counters.get('user_activity', 0)
+        stats['total_emotion_logs'] = counters.get('emotion_logs', 0)
         
-        # Recent registrations (last 7 days)
+        # Recent registrations (today and the 6 days before it)
         cursor.execute("""
-            SELECT COUNT(*) FROM users 
-            WHERE created_at >= datetime('now', '-7 days')
+            SELECT COALESCE(SUM(count), 0) FROM daily_registrations
+            WHERE day > date('now', '-7 days')
         """)
         stats['new_users_7days'] = cursor.fetchone()[0]
         
-        conn.close()
         return stats
     except Exception as e:
         print(f"Error getting stats: {e}")
@@ -305,38 +920,40 @@ def get_database_stats():
 def delete_user(user_id):
     """Delete a user and their data"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Delete related records first
-        cursor.execute("DELETE FROM emotion_logs WHERE user_id = ?", (user_id,))
-        cursor.execute("DELETE FROM user_activity WHERE user_id = ?", (user_id,))
-        cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        with transaction() as conn:
+            cursor = conn.cursor()
+            
+            # Delete related records first
+            cursor.execute("DELETE FROM emotion_logs WHERE user_id = ?", (user_id,))
+            cursor.execute("DELETE FROM user_activity WHERE user_id = ?", (user_id,))
+            cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
+            for table, _ in ROLLUP_TABLES.values():
+                cursor.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
         
-        conn.commit()
-        conn.close()
+        for cache in _CACHES:
+            cache.invalidate(user_id)
         return True, "User deleted successfully!"
     except Exception as e:
         return False, f"Error: {str(e)}"
 
+def _load_user_profile(user_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT id, username, email, age, avatar, created_at
+        FROM users
+        WHERE id = ?
+    """, (user_id,))
+    
+    user = cursor.fetchone()
+    return dict(user) if user else None
+
 def get_user_profile(user_id):
-    """Get user profile data"""
+    """Get user profile data (cached, see CACHE_TTL)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id, username, email, age, avatar, created_at
-            FROM users
-            WHERE id = ?
-        """, (user_id,))
-        
-        user = cursor.fetchone()
-        conn.close()
-        
-        if user:
-            return dict(user)
-        return None
+        profile = _profile_cache.get_or_load(user_id, lambda: _load_user_profile(user_id))
+        return dict(profile) if profile else None
     except Exception as e:
         print(f"Error getting user profile: {e}")
         return None
@@ -364,15 +981,13 @@ def update_user_profile(user_id, age=None, avatar=None, username=None, email=Non
             values.append(email)
         
         if not updates:
-            conn.close()
             return True, "No updates provided"
         
         values.append(user_id)
         query = f"UPDATE users SET {', '.join(updates)} WHERE id = ?"
         
         cursor.execute(query, values)
-        conn.commit()
-        conn.close()
+        _profile_cache.invalidate(user_id)
         
         return True, "Profile updated successfully!"
     except Exception as e:
@@ -387,8 +1002,7 @@ def log_user_activity(user_id, action, details):
             "INSERT INTO user_activity (user_id, action, details) VALUES (?, ?, ?)",
             (user_id, action, details),
         )
-        conn.commit()
-        conn.close()
+        _recent_activity_cache.invalidate(user_id)
         return True
     except Exception as e:
         print(f"Error logging user activity: {e}")
@@ -407,8 +1021,7 @@ def save_dominant_emotion(user_id, dominant_emotion):
             "INSERT INTO emotion_sessions (user_id, dominant_emotion) VALUES (?, ?)",
             (user_id, dominant_emotion),
         )
-        conn.commit()
-        conn.close()
+        _dominant_emotion_cache.invalidate(user_id)
         return True
     except Exception as e:
         print(f"Error saving dominant emotion: {e}")
@@ -418,23 +1031,206 @@ def save_dominant_emotion(user_id, dominant_emotion):
 def get_latest_dominant_emotion(user_id):
     """
     Get the most recently saved dominant emotion for a user.
-    Used by the recommendation engine.
+    Used by the recommendation engine. Cached until the next
+    save_dominant_emotion for the user (or CACHE_TTL).
     """
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
+    def load():
+        cursor = get_db_connection().execute(
             """SELECT dominant_emotion FROM emotion_sessions
                WHERE user_id = ? ORDER BY session_start DESC LIMIT 1""",
             (user_id,),
         )
         row = cursor.fetchone()
-        conn.close()
         return row["dominant_emotion"] if row else None
+
+    try:
+        return _dominant_emotion_cache.get_or_load(user_id, load)
     except Exception as e:
         print(f"Error getting latest dominant emotion: {e}")
         return None
 
+def get_recent_user_activity(user_id, limit=RECENT_ACTIVITY_LIMIT):
+    """
+    A user's latest activity rows (at most RECENT_ACTIVITY_LIMIT), cached
+    until they log new activity. Larger limits go straight to the database.
+    """
+    if limit > RECENT_ACTIVITY_LIMIT:
+        return get_user_activity(user_id, limit=limit)
+    try:
+        rows = _recent_activity_cache.get_or_load(
+            user_id, lambda: _keyset_rows(_ACTIVITY_SELECT, "ua", "timestamp", user_id,
+                                          RECENT_ACTIVITY_LIMIT)
+        )
+        return [dict(row) for row in rows[:limit]]
+    except Exception as e:
+        print(f"Error getting activity: {e}")
+        return []
+
+
+_EMOTION_LOG_INSERT = """INSERT INTO emotion_logs
+    (user_id, detected_emotion, confidence, recommendation_type, recommendation_item, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+_ACTIVITY_INSERT = "INSERT INTO user_activity (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)"
+
+def _utc_timestamp():
+    """Same format as SQLite's CURRENT_TIMESTAMP, taken when the row is queued"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+class LogWriter:
+    """
+    Bounded queue drained by a single writer thread. Rows are grouped per
+    statement and written with executemany in one transaction, every
+    ``flush_rows`` rows or ``flush_interval_ms`` after the oldest waiting row.
+    When the queue is full (slow disk), ``overflow`` decides: "block" the
+    caller, "drop_oldest" queued row, or "drop_newest" (the incoming one).
+    """
+
+    def __init__(self, max_rows=LOG_QUEUE_SIZE, flush_rows=LOG_FLUSH_ROWS,
+                 flush_interval_ms=LOG_FLUSH_INTERVAL_MS, overflow=LOG_OVERFLOW_POLICY):
+        if overflow not in ("block", "drop_oldest", "drop_newest"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self._queue = queue.Queue(maxsize=max_rows)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.overflow = overflow
+        self.dropped = 0
+        self.written = 0
+        self._lock = threading.Lock()
+        self._waiters = []
+        self._thread = None
+        self._stopping = False
+
+    def enqueue(self, sql, params):
+        """Queue one row for writing. Returns False if it (or an older row) was dropped."""
+        self._ensure_started()
+        item = (sql, params)
+        if self.overflow == "block":
+            self._queue.put(item)
+            return True
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        with self._lock:
+            self.dropped += 1
+        if self.overflow == "drop_newest":
+            return False
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+                return False
+            except queue.Full:
+                continue
+
+    def flush(self, timeout=5.0):
+        """Block until every row queued before this call is written."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        with self._lock:
+            self._waiters.append(done)
+        try:
+            self._queue.put_nowait(None)   # wake the writer
+        except queue.Full:
+            pass                           # it's busy and will see the waiter
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Flush and stop the writer thread (registered with atexit)."""
+        self.flush(timeout)
+        self._stopping = True
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="emorecs-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+
+            with self._lock:
+                waiters, self._waiters = self._waiters, []
+            if waiters or self._stopping:
+                # Everything queued before the flush request goes in this batch
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        batch.append(item)
+
+            if batch and (waiters or self._stopping or len(batch) >= self.flush_rows
+                          or time.monotonic() >= deadline):
+                self._write(batch)
+                batch, deadline = [], None
+            for done in waiters:
+                done.set()
+            if self._stopping and self._queue.empty():
+                close_db_connection()
+                return
+
+    def _write(self, batch):
+        grouped = {}
+        for sql, params in batch:
+            grouped.setdefault(sql, []).append(params)
+        try:
+            with transaction() as conn:
+                for sql, rows in grouped.items():
+                    conn.executemany(sql, rows)
+            self.written += len(batch)
+            for user_id in {row[0] for row in grouped.get(_ACTIVITY_INSERT, ())}:
+                _recent_activity_cache.invalidate(user_id)
+        except Exception as e:
+            print(f"Error writing queued logs ({len(batch)} rows dropped): {e}")
+            with self._lock:
+                self.dropped += len(batch)
+
+_log_writer = LogWriter()
+atexit.register(_log_writer.close)
+
+def queue_emotion_detection(user_id, emotion, confidence, recommendation_type=None, recommendation_item=None):
+    """Queue an emotion detection log row for the background writer"""
+    return _log_writer.enqueue(
+        _EMOTION_LOG_INSERT,
+        (user_id, emotion, confidence, recommendation_type, recommendation_item, _utc_timestamp()),
+    )
+
+def queue_user_activity(user_id, action, details):
+    """Queue a user activity row for the background writer"""
+    return _log_writer.enqueue(_ACTIVITY_INSERT, (user_id, action, details, _utc_timestamp()))
+
+def flush_log_queue(timeout=5.0):
+    """Write out all queued log rows now (e.g. when a camera session stops)"""
+    return _log_writer.flush(timeout)
 
-# Initialize database on module import
-init_db()
+def get_log_queue_stats():
+    """Rows written / dropped by the background log writer"""
+    return {"written": _log_writer.written, "dropped": _log_writer.dropped,
+            "queued": _log_writer._queue.qsize()}
@@ -2,7 +2,7 @@
 Emotion Detection Page for EmoRecs
 ───────────────────────────────────
 • OpenCV  → webcam capture (cv2.VideoCapture with CAP_DSHOW on Windows)
-• Haarcascade → face detection
+• Haarcascade / OpenCV DNN SSD → face detection
 • DeepFace → CNN-based emotion classification (FER-2013 weights)
 • Streamlit → live video feed, Start/Stop buttons, emotion cards
 • SQLite3  → saves detected emotion to the database
@@ -11,8 +11,12 @@ Emotion Detection Page for EmoRecs
 import streamlit as st
 import cv2
 import numpy as np
+import os
+import sys
 import time
-from collections import Counter
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import database
 
 
@@ -37,56 +41,690 @@ EMOTION_COLORS = {
     "neutral":  (200, 200, 200),
 }
 
+# Output order of the FER-2013 Emotion model's softmax layer
+EMOTION_LABELS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+FER_INPUT_SIZE = 48
+
 ANALYSE_EVERY_N_FRAMES = 10
 DB_LOG_COOLDOWN = 5.0
+SMOOTHING_MODE = "ema"           # "ema" or "window"
+SMOOTHING_ALPHA = 0.4            # EMA weight given to the newest inference
+SMOOTHING_WINDOW = 8             # score vectors kept per face for "window"
+EMOTION_HISTORY_LEN = 8          # recent detections shown as chips
+
+# Video sent to the browser: encoded once as JPEG here so Streamlit passes the
+# bytes straight through instead of re-encoding a raw RGB array per frame.
+DISPLAY_WIDTH = 640              # frames wider than this are downsized first
+DISPLAY_JPEG_QUALITY = 80
+MAX_DISPLAY_FPS = 15.0           # frames pushed per second; analysis keeps camera rate
+CAPTURE_BUFFER_SIZE = 2          # newest frames kept by the capture thread
+CAPTURE_READ_TIMEOUT = 2.0       # seconds to wait for a frame before giving up
+
+# Where frames come from: a webcam index ("0"), a video file, a directory of
+# images or a stream URL (rtsp://..., http://...). See VideoSource.
+VIDEO_SOURCE = os.environ.get("EMORECS_VIDEO_SOURCE", "0")
+CAPTURE_WIDTH = 640              # requested from webcams; other sources keep their size
+CAPTURE_HEIGHT = 480
+CAPTURE_FPS = 0.0                # 0 = device default / as fast as files decode
+CAPTURE_LAG_POLICY = None        # "drop" / "block"; None = drop for live, block for files
+INFERENCE_WORKERS = 2            # threads running emotion inference
+BATCH_INFERENCE = True           # one forward pass for all faces in a frame
+
+# TensorFlow CPU runtime. Thread counts must be set before TF runs its first
+# op (0 = TF's default, one thread per core). On big CPU boxes a few intra-op
+# threads per inference worker is usually faster than oversubscribing.
+TF_INTRA_OP_THREADS = int(os.environ.get("EMORECS_TF_INTRA_THREADS", "0"))
+TF_INTER_OP_THREADS = int(os.environ.get("EMORECS_TF_INTER_THREADS", "0"))
+TF_FUNCTION = True               # run the Emotion model as a traced tf.function graph
+TF_JIT_COMPILE = False           # XLA-compile that graph (try it on many-core CPUs)
+WARMUP_BATCH_SIZES = (1, 2, 4)   # synthetic batches run once the model is loaded
+
+# Emotion inference engine: "tensorflow" (DeepFace's Keras model) or "opencv"
+# (the same weights exported to ONNX by export_emotion_onnx.py and run with
+# cv2.dnn - TensorFlow is never imported, which saves most of the memory).
+INFERENCE_ENGINE = os.environ.get("EMORECS_INFERENCE_ENGINE", "tensorflow")
+
+# Face detector: "haar" (Haarcascade) or "ssd" (ResNet-10 SSD via cv2.dnn).
+# The SSD weights are not bundled; download res10_300x300_ssd_iter_140000.caffemodel
+# from the opencv_3rdparty repo into models/ next to deploy.prototxt.
+FACE_DETECTOR = "haar"
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+SSD_PROTOTXT = os.path.join(MODELS_DIR, "deploy.prototxt")
+SSD_WEIGHTS = os.path.join(MODELS_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+SSD_CONFIDENCE = 0.5
+EMOTION_ONNX = os.path.join(MODELS_DIR, "emotion_fer.onnx")   # see export_emotion_onnx.py
+
+# Detect-then-track: full detection every N frames (or when a track is lost),
+# cheap template matching moves the boxes in between.
+DETECT_EVERY_N_FRAMES = 5
+TRACK_MIN_SCORE = 0.55           # match score below which a track counts as lost
+TRACK_IOU_MATCH = 0.3            # IoU needed to keep a face's ID across detections
+TRACK_TEMPLATE_WIDTH = 32        # faces are matched at this width to keep it cheap
+
+# Detection runs on a downscaled frame (0.5: 640x480 -> 320x240, ~4x cheaper);
+# boxes are mapped back to full resolution for cropping and drawing.
+DETECTION_SCALE = 0.5
+DETECTION_ROI_SEARCH = True      # look around last detection's faces first
+DETECTION_ROI_MARGIN = 0.5       # search window grows by this much of the face per side
+DETECTION_FULL_EVERY = 4         # still scan the whole frame every Nth detection
+
+
+# ━━━━━━━━━━━━━━  FACE DETECTORS  ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+def _iou(a, b):
+    """Intersection-over-union of two ``(x, y, w, h)`` boxes."""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+class HaarFaceDetector:
+    """Haarcascade frontal-face detector (fast, CPU-light, less accurate)."""
+
+    name = "haar"
+    uses_gray = True
+
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=(60, 60)):
+        self.cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        )
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, frame, gray=None, scale=1.0):
+        """
+        Return face boxes as a list of ``(x, y, w, h)`` ints. ``scale`` is how
+        much the input was downscaled, so ``min_size`` keeps meaning full-res pixels.
+        """
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        min_size = tuple(max(1, int(round(v * scale))) for v in self.min_size)
+        faces = self.cascade.detectMultiScale(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=min_size, flags=cv2.CASCADE_SCALE_IMAGE,
+        )
+        return [tuple(int(v) for v in f) for f in faces]
+
+
+class SSDFaceDetector:
+    """
+    ResNet-10 SSD face detector run through cv2.dnn (models/deploy.prototxt).
+    More robust to pose and lighting than Haar at a higher CPU cost. The input
+    blob is allocated once and refilled in place for every frame; the cached
+    instance is shared by every session, so a lock covers blob and Net.
+    """
+
+    name = "ssd"
+    uses_gray = False
+    MEAN_BGR = (104.0, 177.0, 123.0)
+
+    def __init__(self, prototxt=SSD_PROTOTXT, weights=SSD_WEIGHTS,
+                 confidence=SSD_CONFIDENCE, input_size=300):
+        if not os.path.exists(weights):
+            raise FileNotFoundError(f"SSD face detector weights not found: {weights}")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, weights)
+        self.confidence = confidence
+        self.input_size = input_size
+        self._resized = np.empty((input_size, input_size, 3), dtype=np.uint8)
+        self._hwc = np.empty((input_size, input_size, 3), dtype=np.float32)
+        self._blob = np.empty((1, 3, input_size, input_size), dtype=np.float32)
+        self._mean = np.array(self.MEAN_BGR, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def _fill_blob(self, frame):
+        size = self.input_size
+        cv2.resize(frame, (size, size), dst=self._resized)
+        np.subtract(self._resized, self._mean, out=self._hwc)
+        self._blob[0] = self._hwc.transpose(2, 0, 1)
+        return self._blob
+
+    def detect(self, frame, gray=None, scale=1.0):
+        """Return face boxes above the confidence threshold as ``(x, y, w, h)`` ints."""
+        h, w = frame.shape[:2]
+        with self._lock:
+            self.net.setInput(self._fill_blob(frame))
+            detections = self.net.forward()[0, 0].copy()
+        boxes = []
+        for det in detections[detections[:, 2] >= self.confidence]:
+            x1, y1, x2, y2 = (det[3:7] * (w, h, w, h)).astype(int)
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(w, x2), min(h, y2)
+            if x2 - x1 > 0 and y2 - y1 > 0:
+                boxes.append((int(x1), int(y1), int(x2 - x1), int(y2 - y1)))
+        return boxes
+
+
+FACE_DETECTORS = {
+    HaarFaceDetector.name: HaarFaceDetector,
+    SSDFaceDetector.name: SSDFaceDetector,
+}
+
+
+class RegionFaceDetector:
+    """
+    Wraps a detector so it runs on a downscaled copy of the frame and maps the
+    boxes back to full resolution. With ``roi_search`` it first looks only in
+    windows around the faces it found last time, and falls back to the whole
+    frame when those come up empty (plus every ``full_every`` calls, so new
+    faces entering elsewhere are still picked up).
+
+    The last boxes make this per-stream state: build one per pipeline around
+    the shared (cached) inner detector.
+    """
+
+    def __init__(self, detector, scale=DETECTION_SCALE, roi_search=DETECTION_ROI_SEARCH,
+                 margin=DETECTION_ROI_MARGIN, full_every=DETECTION_FULL_EVERY):
+        self.detector = detector
+        self.name = detector.name
+        self.scale = scale
+        self.roi_search = roi_search
+        self.margin = margin
+        self.full_every = max(1, full_every)
+        self._last_boxes = []
+        self._calls = 0
+
+    def detect(self, frame, gray=None):
+        if gray is None and self.detector.uses_gray:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        boxes = []
+        if self.roi_search and self._last_boxes and self._calls % self.full_every:
+            boxes = self._detect_in_windows(frame, gray)
+        if not boxes:
+            boxes = self._detect_scaled(frame, gray)
+        self._calls += 1
+        self._last_boxes = boxes
+        return boxes
+
+    def _detect_in_windows(self, frame, gray):
+        H, W = frame.shape[:2]
+        boxes = []
+        for (x, y, w, h) in self._last_boxes:
+            mx, my = int(w * self.margin), int(h * self.margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(W, x + w + mx), min(H, y + h + my)
+            sub_gray = gray[y0:y1, x0:x1] if gray is not None else None
+            for (bx, by, bw, bh) in self._detect_scaled(frame[y0:y1, x0:x1], sub_gray):
+                box = (bx + x0, by + y0, bw, bh)
+                # Windows of neighbouring faces overlap; keep one box per face
+                if all(_iou(box, other) < 0.5 for other in boxes):
+                    boxes.append(box)
+        return boxes
+
+    def _detect_scaled(self, frame, gray):
+        s = self.scale
+        if s >= 1.0:
+            return self.detector.detect(frame, gray)
+        size = (max(1, int(frame.shape[1] * s)), max(1, int(frame.shape[0] * s)))
+        if self.detector.uses_gray:
+            small_frame, small_gray = None, cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        else:
+            small_frame, small_gray = cv2.resize(frame, size, interpolation=cv2.INTER_AREA), None
+        fx, fy = frame.shape[1] / size[0], frame.shape[0] / size[1]
+        return [
+            (int(round(x * fx)), int(round(y * fy)), int(round(w * fx)), int(round(h * fy)))
+            for (x, y, w, h) in self.detector.detect(small_frame, small_gray, scale=s)
+        ]
+
+
+def build_face_detector(kind=FACE_DETECTOR, **kwargs):
+    """
+    Create the configured face detector. It keeps no per-stream state, so
+    one instance can be cached and shared; EmotionPipeline wraps it in a
+    RegionFaceDetector of its own. Falls back to Haar when the SSD weights
+    are missing so the page still works out of the box.
+    """
+    if kind not in FACE_DETECTORS:
+        raise ValueError(f"Unknown face detector '{kind}' (choose from {sorted(FACE_DETECTORS)})")
+    try:
+        detector = FACE_DETECTORS[kind](**kwargs)
+    except FileNotFoundError as e:
+        print(f"{e} - falling back to Haarcascade")
+        detector = HaarFaceDetector()
+    return detector
+
+
+# ━━━━━━━━━━━━━━  FACE TRACKER (stable IDs between detections)  ━━━━━━
+class _Track:
+    __slots__ = ("id", "box", "template", "scale", "score")
+
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.template = None
+        self.scale = 1.0
+        self.score = 1.0
+
+
+class FaceTracker:
+    """
+    Runs the full face detector every ``detect_every`` frames, or sooner when
+    a track's match score drops below ``min_score``. In between, each face is
+    moved by normalised template matching in a window around its last box,
+    done at ``TRACK_TEMPLATE_WIDTH`` pixels wide so it costs a fraction of a
+    detection pass. Detections are matched to tracks by IoU, so each face
+    keeps a stable ID that emotion results can be attached to.
+    """
+
+    def __init__(self, detector, detect_every=DETECT_EVERY_N_FRAMES,
+                 min_score=TRACK_MIN_SCORE, iou_match=TRACK_IOU_MATCH):
+        self.detector = detector
+        self.detect_every = detect_every
+        self.min_score = min_score
+        self.iou_match = iou_match
+        self.tracks = []
+        self._next_id = 1
+        self._since_detect = detect_every   # detect on the first frame
+
+    def update(self, frame, gray):
+        """Advance one frame and return ``[(face_id, (x, y, w, h)), ...]``."""
+        lost = False
+        if self._since_detect < self.detect_every:
+            for track in self.tracks:
+                self._follow(track, gray)
+                lost = lost or track.score < self.min_score
+        if lost or self._since_detect >= self.detect_every:
+            self._associate(self.detector.detect(frame, gray), gray)
+            self._since_detect = 0
+        self._since_detect += 1
+        return [(t.id, t.box) for t in self.tracks]
+
+    def _snapshot(self, track, gray):
+        x, y, w, h = track.box
+        track.scale = TRACK_TEMPLATE_WIDTH / float(max(w, 1))
+        size = (TRACK_TEMPLATE_WIDTH, max(1, int(round(h * track.scale))))
+        track.template = cv2.resize(gray[y:y+h, x:x+w], size, interpolation=cv2.INTER_AREA)
+        track.score = 1.0
+
+    def _follow(self, track, gray):
+        x, y, w, h = track.box
+        H, W = gray.shape[:2]
+        mx, my = w // 2, h // 2   # search half a face in every direction
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(W, x + w + mx), min(H, y + h + my)
+        window = cv2.resize(
+            gray[y0:y1, x0:x1],
+            (max(1, int(round((x1 - x0) * track.scale))), max(1, int(round((y1 - y0) * track.scale)))),
+            interpolation=cv2.INTER_AREA,
+        )
+        th, tw = track.template.shape[:2]
+        if window.shape[0] < th or window.shape[1] < tw:
+            track.score = 0.0
+            return
+        result = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (lx, ly) = cv2.minMaxLoc(result)
+        track.score = float(score)
+        nx = min(max(0, x0 + int(round(lx / track.scale))), W - w)
+        ny = min(max(0, y0 + int(round(ly / track.scale))), H - h)
+        track.box = (nx, ny, w, h)
+
+    def _associate(self, detections, gray):
+        pairs = sorted(
+            ((_iou(t.box, d), ti, di)
+             for ti, t in enumerate(self.tracks) for di, d in enumerate(detections)),
+            reverse=True,
+        )
+        kept, used_t, used_d = [], set(), set()
+        for iou, ti, di in pairs:
+            if iou < self.iou_match:
+                break
+            if ti in used_t or di in used_d:
+                continue
+            used_t.add(ti)
+            used_d.add(di)
+            track = self.tracks[ti]
+            track.box = detections[di]
+            kept.append(track)
+        for di, box in enumerate(detections):
+            if di not in used_d:
+                kept.append(_Track(self._next_id, box))
+                self._next_id += 1
+        for track in kept:
+            self._snapshot(track, gray)
+        # Left-to-right keeps the overlay order steady
+        self.tracks = sorted(kept, key=lambda t: t.box[0])
+
+
+# ━━━━━━━━━━━━━━  TF RUNTIME (threads, compiled graph, warm-up)  ━━━━━━
+def _configure_tf_runtime(intra=TF_INTRA_OP_THREADS, inter=TF_INTER_OP_THREADS):
+    """Apply the thread-pool sizes; only possible before TF's first op."""
+    import tensorflow as tf
+
+    try:
+        if intra:
+            tf.config.threading.set_intra_op_parallelism_threads(intra)
+        if inter:
+            tf.config.threading.set_inter_op_parallelism_threads(inter)
+    except RuntimeError as e:
+        print(f"TensorFlow already initialised, thread settings ignored: {e}")
+
+
+class CompiledEmotionNet:
+    """
+    The Keras Emotion network behind one ``tf.function`` with a fixed
+    ``(None, 48, 48, 1)`` float32 signature: traced once for every batch
+    size, no Keras ``predict`` overhead per call. Same ``predict_on_batch``
+    interface as the Keras model.
+    """
+
+    def __init__(self, keras_model, jit_compile=TF_JIT_COMPILE):
+        import tensorflow as tf
+
+        self.model = keras_model
+        spec = tf.TensorSpec((None, FER_INPUT_SIZE, FER_INPUT_SIZE, 1), tf.float32)
+        self._forward = tf.function(
+            lambda x: keras_model(x, training=False),
+            input_signature=[spec],
+            jit_compile=jit_compile,
+            reduce_retracing=True,
+        )
+
+    def predict_on_batch(self, batch):
+        return self._forward(batch).numpy()
+
+
+class OpenCVEmotionNet:
+    """
+    The exported FER network (ONNX, NHWC input like the Keras model) on
+    cv2.dnn. A Net isn't safe to call from several threads, so inference
+    workers take turns; cv2.dnn parallelises each forward pass itself.
+    """
+
+    def __init__(self, onnx_path=EMOTION_ONNX):
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"Exported emotion model not found: {onnx_path} "
+                "(run export_emotion_onnx.py once with TensorFlow installed)"
+            )
+        self.net = cv2.dnn.readNetFromONNX(onnx_path)
+        self._lock = threading.Lock()
+
+    def predict_on_batch(self, batch):
+        with self._lock:
+            self.net.setInput(np.ascontiguousarray(batch, dtype=np.float32))
+            return self.net.forward().copy()
+
+
+def _warm_up_model(emotion_model, batch_sizes=WARMUP_BATCH_SIZES):
+    """
+    Push synthetic crops through the classifier so graph tracing and the
+    oneDNN/allocator set-up happen now, not when the first face appears.
+    """
+    rng = np.random.default_rng(0)
+    for n in batch_sizes:
+        crops = [rng.integers(0, 256, (96, 96, 3), dtype=np.uint8) for _ in range(n)]
+        _classify_faces_batch(emotion_model, crops)
 
 
 # ━━━━━━━━━━━━━━  MODEL LOADER (cached)  ━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 @st.cache_resource(show_spinner="🔄 Loading emotion detection model …")
-def _load_models():
-    """Load Haarcascade + DeepFace Emotion model (cached once)."""
-    from deepface import DeepFace
+def _load_models(detector=FACE_DETECTOR, engine=INFERENCE_ENGINE):
+    """
+    Load the shared face detector + emotion model (cached once) and warm both up.
+    Returns ``(face_detector, DeepFace, emotion_model)`` where
+    ``emotion_model`` runs the FER network directly (CompiledEmotionNet, or
+    OpenCVEmotionNet for engine "opencv", in which case DeepFace is None).
+    """
+    face_detector = build_face_detector(detector)
+    face_detector.detect(np.zeros((480, 640, 3), dtype=np.uint8))
 
-    face_cascade = cv2.CascadeClassifier(
-        cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-    )
-    DeepFace.build_model(task="facial_attribute", model_name="Emotion")
-    return face_cascade, DeepFace
+    DeepFace = emotion_model = None
+    if engine == "opencv":
+        try:
+            emotion_model = OpenCVEmotionNet()
+        except (FileNotFoundError, cv2.error) as e:
+            print(f"OpenCV emotion engine unavailable ({e}); using TensorFlow.")
+    elif engine != "tensorflow":
+        print(f"Unknown inference engine '{engine}'; using TensorFlow.")
+    if emotion_model is None:
+        _configure_tf_runtime()
+        from deepface import DeepFace
+
+        emotion_model = _emotion_network(DeepFace)
+    _warm_up_model(emotion_model)
+    return face_detector, DeepFace, emotion_model
+
+
+def warm_up():
+    """
+    Fill the model cache ahead of the first visit. app.py runs this on a
+    background thread at server start, so opening the Emotion Detection
+    page doesn't wait for TensorFlow to import and the model to load.
+    """
+    _load_models()
 
 
-# ━━━━━━━━━━━━━━  OPEN CAMERA (cached per session)  ━━━━━━━━━━━━━━━━━
-@st.cache_resource(show_spinner="📷 Opening camera …")
-def _get_camera():
+# ━━━━━━━━━━━━━━  VIDEO SOURCE (webcam / file / images / stream)  ━━━━
+_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def _capture_backends():
+    """Webcam backends to try on this platform, best first."""
+    if sys.platform.startswith("win"):
+        return [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]   # DSHOW: most Windows webcams
+    if sys.platform.startswith("linux"):
+        return [cv2.CAP_V4L2, cv2.CAP_ANY]
+    if sys.platform == "darwin":
+        return [cv2.CAP_AVFOUNDATION, cv2.CAP_ANY]
+    return [cv2.CAP_ANY]
+
+
+class _ImageSequence:
+    """A directory of still images behind the ``read()``/``release()`` of a VideoCapture."""
+
+    def __init__(self, directory):
+        self.paths = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(_IMAGE_EXTENSIONS)
+        )
+        self._next = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self):
+        while self._next < len(self.paths):
+            frame = cv2.imread(self.paths[self._next])
+            self._next += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def release(self):
+        self._next = len(self.paths)
+
+
+class VideoSource:
     """
-    Open the webcam and cache it so it stays open across Streamlit reruns.
-    Tries CAP_DSHOW first (required on most Windows devices), then fallbacks.
+    Frames from a webcam index, a video file, a directory of images or a
+    stream URL (rtsp://, http://, ...), decoded on a daemon thread into a
+    small ring buffer.
+
+    ``lag_policy`` says what happens when the consumer is slower than the
+    source: "drop" keeps only the newest frames (live sources - analysis
+    never falls behind the camera); "block" pauses decoding until the
+    consumer catches up, so every frame of a recording is processed, as
+    fast as the CPU allows. ``fps`` caps the decode rate (files/images play
+    back in real time; for devices it's requested from the driver).
+    ``width``/``height`` are only requested from webcams; frames are never
+    resized here, so recordings and streams keep their own size and aspect
+    ratio (the display path downsizes them proportionally).
     """
-    for backend in [cv2.CAP_DSHOW, cv2.CAP_MSMF, cv2.CAP_ANY]:
-        cap = cv2.VideoCapture(0, backend)
-        if cap.isOpened():
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-            # Read a few warm-up frames (some cameras return black initially)
-            for _ in range(5):
-                cap.read()
-            return cap
-        cap.release()
 
-    # Last resort
-    cap = cv2.VideoCapture(0)
-    if cap.isOpened():
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        for _ in range(5):
-            cap.read()
-        return cap
+    def __init__(self, source=VIDEO_SOURCE, width=None, height=None, fps=0.0,
+                 lag_policy=None, buffer_size=CAPTURE_BUFFER_SIZE):
+        self.source = source
+        self.kind = self._classify(source)
+        self.width, self.height, self.fps = width, height, fps
+        self.lag_policy = lag_policy or ("drop" if self.live else "block")
+        if self.lag_policy not in ("drop", "block"):
+            raise ValueError(f"Unknown lag policy '{self.lag_policy}'")
+        self.cap = None
+        self._frames = deque(maxlen=buffer_size)
+        self._buffer_size = buffer_size
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._running = False
+        self._thread = None
+        self.eof = False                 # a file / image directory ran out
+        self.dropped = 0                 # frames skipped because the consumer lagged
+
+    @staticmethod
+    def _classify(source):
+        if isinstance(source, int) or str(source).isdigit():
+            return "webcam"
+        if "://" in str(source):
+            return "stream"
+        if os.path.isdir(source):
+            return "images"
+        return "file"
 
-    return None
+    @property
+    def live(self):
+        return self.kind in ("webcam", "stream")
+
+    def open(self):
+        """Open the underlying capture. Returns False if it can't be opened."""
+        if self.kind == "images":
+            self.cap = _ImageSequence(self.source)
+        elif self.kind == "webcam":
+            self.cap = self._open_webcam(int(self.source))
+        elif self.kind == "stream":
+            self.cap = cv2.VideoCapture(self.source, cv2.CAP_FFMPEG)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)   # don't queue up stale frames
+        else:
+            self.cap = cv2.VideoCapture(self.source)
+        if self.cap is None or not self.cap.isOpened():
+            self.cap = None
+            return False
+        return True
+
+    def _open_webcam(self, index):
+        for backend in _capture_backends():
+            cap = cv2.VideoCapture(index, backend)
+            if cap.isOpened():
+                if self.width and self.height:
+                    cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+                    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+                if self.fps:
+                    cap.set(cv2.CAP_PROP_FPS, self.fps)
+                # Read a few warm-up frames (some cameras return black initially)
+                for _ in range(5):
+                    cap.read()
+                return cap
+            cap.release()
+        return None
+
+    def start(self):
+        """Open (if needed) and start the decode thread. Returns self, or None on failure."""
+        if self.cap is None and not self.open():
+            return None
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="emorecs-capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        pace = 1.0 / self.fps if self.fps and not self.live else 0.0
+        next_due = time.perf_counter()
+        try:
+            while self._running:
+                ret, frame = self.cap.read()
+                if pace:
+                    next_due += pace
+                    delay = next_due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                with self._cond:
+                    if not ret:
+                        self.eof = not self.live
+                        break
+                    if self.lag_policy == "block":
+                        self._cond.wait_for(
+                            lambda: not self._running or len(self._frames) < self._buffer_size
+                        )
+                        if not self._running:
+                            break
+                    self._seq += 1
+                    self._frames.append((self._seq, frame))
+                    self._cond.notify_all()
+        finally:
+            # Released here so the capture is never closed mid-read
+            self.cap.release()
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+
+    def read(self, after_seq=0, timeout=CAPTURE_READ_TIMEOUT):
+        """
+        Block until a frame newer than ``after_seq`` is available and return
+        ``(seq, frame)`` - the newest one under "drop", the next one in order
+        under "block". Returns ``(after_seq, None)`` on timeout or once the
+        source has ended and every frame was read.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: not self._running or (self._frames and self._frames[-1][0] > after_seq),
+                timeout=timeout,
+            )
+            while self._frames and self._frames[0][0] <= after_seq:
+                self._frames.popleft()
+            if not self._frames:
+                return after_seq, None
+            if self.lag_policy == "block":
+                item = self._frames.popleft()
+                self._cond.notify_all()   # room for the decoder again
+            else:
+                item = self._frames[-1]
+            self.dropped += item[0] - after_seq - 1 if after_seq else 0
+            return item
+
+    def frames(self, timeout=CAPTURE_READ_TIMEOUT):
+        """Iterate over frames until the source ends (bulk processing)."""
+        seq = 0
+        while True:
+            seq, frame = self.read(seq, timeout)
+            if frame is None:
+                if self.running:
+                    continue
+                return
+            yield frame
+
+    @property
+    def running(self):
+        return self._running
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+
+# One source per process, shared across reruns (the camera stays open).
+_source = None
+_source_lock = threading.Lock()
+
+
+def _get_video_source():
+    """Open (once) the configured VIDEO_SOURCE and start its decode thread."""
+    global _source
+    with _source_lock:
+        if _source is None or not _source.running:
+            _source = VideoSource(VIDEO_SOURCE, width=CAPTURE_WIDTH, height=CAPTURE_HEIGHT,
+                                  fps=CAPTURE_FPS, lag_policy=CAPTURE_LAG_POLICY).start()
+        return _source
 
 
 def _release_camera():
-    """Release the cached camera and clear the cache."""
-    _get_camera.clear()
+    """Stop the decode thread and release the capture (reopened on next use)."""
+    global _source
+    with _source_lock:
+        if _source is not None:
+            _source.stop()
+            _source = None
 
 
 # ━━━━━━━━━━━━━━  EMOTION ANALYSER  ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -109,6 +747,178 @@ def _analyse_emotion(deepface_module, face_bgr):
         return "neutral", 0.0, {}
 
 
+# ━━━━━━━━━━━━━━  BATCHED EMOTION CLASSIFIER  ━━━━━━━━━━━━━━━━━━━━━━━━
+def _emotion_network(deepface_module, compiled=TF_FUNCTION):
+    """
+    Return the network behind DeepFace's (internally cached) Emotion model,
+    wrapped in CompiledEmotionNet unless ``compiled`` is False.
+    """
+    client = deepface_module.build_model(task="facial_attribute", model_name="Emotion")
+    model = getattr(client, "model", client)
+    return CompiledEmotionNet(model) if compiled else model
+
+
+def _preprocess_faces(face_crops):
+    """Stack BGR face crops into one (N, 48, 48, 1) float32 batch scaled to [0, 1]."""
+    size = FER_INPUT_SIZE
+    batch = np.empty((len(face_crops), size, size, 1), dtype=np.float32)
+    for i, crop in enumerate(face_crops):
+        gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        batch[i, :, :, 0] = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA)
+    batch *= 1.0 / 255.0
+    return batch
+
+
+def _scores_from_probs(probs):
+    """Turn one softmax row into ``(dominant, confidence, scores)`` like DeepFace.analyze."""
+    total = float(probs.sum()) or 1.0
+    scores = {label: 100.0 * float(p) / total for label, p in zip(EMOTION_LABELS, probs)}
+    dominant = EMOTION_LABELS[int(np.argmax(probs))]
+    return dominant, scores[dominant] / 100.0, scores
+
+
+def _classify_faces_batch(emotion_model, face_crops):
+    """
+    Classify every face crop of a frame with a single forward pass.
+    Returns one ``(dominant, confidence, scores)`` tuple per crop, in order.
+    """
+    if not face_crops:
+        return []
+    try:
+        probs = np.asarray(emotion_model.predict_on_batch(_preprocess_faces(face_crops)))
+        return [_scores_from_probs(row) for row in probs]
+    except Exception:
+        return [("neutral", 0.0, {})] * len(face_crops)
+
+
+def _predict_emotion(emotion_model, face_bgr):
+    """
+    Lean single-face path: grayscale, resize, normalise and predict on the
+    crop we already have. Skips DeepFace.analyze's detector-backend plumbing,
+    re-alignment and result building.
+    """
+    return _classify_faces_batch(emotion_model, [face_bgr])[0]
+
+
+def _predict_keyed_face(emotion_model, key, face_bgr):
+    """Per-face path, shaped like the batch path's ``{face key: result}``."""
+    return {key: _predict_emotion(emotion_model, face_bgr)}
+
+
+def _classify_keyed_faces(emotion_model, keys, face_crops):
+    """Batch-classify crops and return the results as ``{face key: result}``."""
+    return dict(zip(keys, _classify_faces_batch(emotion_model, face_crops)))
+
+
+# ━━━━━━━━━━━━━━  TEMPORAL SMOOTHING (per face)  ━━━━━━━━━━━━━━━━━━━━
+class _FaceScores:
+    """Fixed-size ring buffer of one face's recent score vectors."""
+
+    __slots__ = ("ring", "pos", "count", "total", "ema")
+
+    def __init__(self, window):
+        self.ring = np.zeros((window, len(EMOTION_LABELS)), dtype=np.float32)
+        self.pos = 0
+        self.count = 0
+        self.total = np.zeros(len(EMOTION_LABELS), dtype=np.float32)
+        self.ema = None
+
+
+class EmotionSmoother:
+    """
+    Smooths each face's 7-class score vectors over time so the on-screen
+    label stops flickering between single noisy inferences. ``"ema"`` keeps an
+    exponential moving average; ``"window"`` averages the last ``window``
+    vectors from a ring buffer with a running sum. Also counts the smoothed
+    dominant emotion of every update, so the session's dominant emotion is
+    an argmax over 7 counters rather than a scan of the whole history.
+    """
+
+    def __init__(self, mode=SMOOTHING_MODE, alpha=SMOOTHING_ALPHA, window=SMOOTHING_WINDOW):
+        if mode not in ("ema", "window"):
+            raise ValueError(f"Unknown smoothing mode '{mode}'")
+        self.mode = mode
+        self.alpha = alpha
+        self.window = window
+        self._faces = {}
+        self._session_counts = np.zeros(len(EMOTION_LABELS), dtype=np.int64)
+
+    def update(self, face_id, scores):
+        """Fold one inference into the face's state; return the smoothed result."""
+        vec = np.array([scores.get(label, 0.0) for label in EMOTION_LABELS], dtype=np.float32)
+        face = self._faces.get(face_id)
+        if face is None:
+            face = self._faces[face_id] = _FaceScores(self.window)
+
+        face.total += vec - face.ring[face.pos]
+        face.ring[face.pos] = vec
+        face.pos = (face.pos + 1) % self.window
+        face.count = min(face.count + 1, self.window)
+        if face.pos == 0:
+            face.total = face.ring.sum(axis=0)   # resync so float drift can't build up
+        face.ema = vec if face.ema is None else self.alpha * vec + (1.0 - self.alpha) * face.ema
+
+        smoothed = face.ema if self.mode == "ema" else face.total / face.count
+        idx = int(np.argmax(smoothed))
+        self._session_counts[idx] += 1
+        dominant = EMOTION_LABELS[idx]
+        smoothed_scores = {label: float(v) for label, v in zip(EMOTION_LABELS, smoothed)}
+        return dominant, smoothed_scores[dominant] / 100.0, smoothed_scores
+
+    def forget(self, face_id):
+        """Drop the state of a face that left the frame."""
+        self._faces.pop(face_id, None)
+
+    def session_dominant(self):
+        """Most frequent smoothed emotion this session, or None before any result."""
+        if not self._session_counts.any():
+            return None
+        return EMOTION_LABELS[int(np.argmax(self._session_counts))]
+
+
+# ━━━━━━━━━━━━━━  INFERENCE POOL (async, latest face wins)  ━━━━━━━━━━
+@st.cache_resource(show_spinner=False)
+def _get_inference_executor(workers=INFERENCE_WORKERS):
+    """Shared worker threads for emotion inference (TF releases the GIL)."""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="emorecs-infer")
+
+
+class _InferenceScheduler:
+    """
+    Submits face crops to the inference executor and hands back results as
+    they finish. A crop that is still queued when a newer crop of the same
+    face arrives is cancelled, so workers only ever analyse the latest view.
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+        self._inflight = []   # (face key, future) in submission order
+
+    def submit(self, key, fn, *args):
+        for k, fut in self._inflight:
+            if k == key:
+                fut.cancel()   # no-op once the worker has started it
+        fut = self._executor.submit(fn, *args)
+        self._inflight.append((key, fut))
+        return fut
+
+    def collect(self):
+        """Return ``{face key: result}`` for work finished since the last call."""
+        results, pending = {}, []
+        for key, fut in self._inflight:
+            if not fut.done():
+                pending.append((key, fut))
+            elif not fut.cancelled() and fut.exception() is None:
+                results[key] = fut.result()   # later submissions overwrite earlier
+        self._inflight = pending
+        return results
+
+    def cancel_all(self):
+        for _, fut in self._inflight:
+            fut.cancel()
+        self._inflight = []
+
+
 # ━━━━━━━━━━━━━━  DRAW BOUNDING BOX  ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 def _draw_fancy_box(img, x, y, w, h, color, label):
     """Draw corner-style bounding box with label."""
@@ -128,44 +938,213 @@ def _draw_fancy_box(img, x, y, w, h, color, label):
                 cv2.FONT_HERSHEY_SIMPLEX, 0.65, (255, 255, 255), 2)
 
 
+# ━━━━━━━━━━━━━━  FRAME OUTPUT (JPEG)  ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+def _encode_frame(img, width=DISPLAY_WIDTH, quality=DISPLAY_JPEG_QUALITY):
+    """Downsize a BGR frame to ``width`` and JPEG-encode it; returns bytes or None."""
+    h, w = img.shape[:2]
+    if width and w > width:
+        img = cv2.resize(img, (width, int(round(h * width / w))), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return buf.tobytes() if ok else None
+
+
 # ━━━━━━━━━━━━━━  EMOTION RESULT CARD  ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-def _render_emotion_card(container, emotion, confidence, scores, history):
-    """Render styled emotion result card."""
-    emoji = EMOTION_EMOJI.get(emotion, "🤔")
-    bars = ""
-    for emo in ["happy", "sad", "angry", "surprise", "fear", "disgust", "neutral"]:
-        pct = scores.get(emo, 0)
-        e = EMOTION_EMOJI.get(emo, "")
-        bar_color = "#6c63ff" if emo == emotion else "rgba(255,255,255,0.18)"
-        fw = "700" if emo == emotion else "400"
-        bars += f"""
+CARD_EMOTION_ORDER = ["happy", "sad", "angry", "surprise", "fear", "disgust", "neutral"]
+
+# Templates are built once; per render only the numbers are filled in.
+_BAR_TEMPLATE = """
         <div style="display:flex;align-items:center;gap:8px;margin:5px 0;">
-            <span style="width:100px;font-size:0.85rem;font-weight:{fw};">{e} {emo.capitalize()}</span>
+            <span style="width:100px;font-size:0.85rem;font-weight:{weight};">{label}</span>
             <div style="flex:1;background:rgba(255,255,255,0.08);border-radius:6px;height:16px;overflow:hidden;">
-                <div style="width:{pct:.1f}%;background:{bar_color};height:100%;border-radius:6px;"></div>
+                <div style="width:{pct:.1f}%;background:{color};height:100%;border-radius:6px;"></div>
             </div>
             <span style="width:50px;text-align:right;font-size:0.8rem;">{pct:.1f}%</span>
         </div>"""
 
-    chips = ""
-    for h_emo in history[-8:]:
-        h_e = EMOTION_EMOJI.get(h_emo, "")
-        chips += (f'<span style="display:inline-block;background:rgba(255,255,255,0.12);'
-                  f'border-radius:12px;padding:3px 10px;margin:2px;font-size:0.78rem;">'
-                  f'{h_e} {h_emo.capitalize()}</span>')
+_CHIP_HTML = {
+    emo: (f'<span style="display:inline-block;background:rgba(255,255,255,0.12);'
+          f'border-radius:12px;padding:3px 10px;margin:2px;font-size:0.78rem;">'
+          f'{EMOTION_EMOJI.get(emo, "")} {emo.capitalize()}</span>')
+    for emo in EMOTION_EMOJI
+}
 
-    container.markdown(f"""
+_CARD_TEMPLATE = """
     <div style="background:rgba(255,255,255,0.10);backdrop-filter:blur(14px);
                 border-radius:20px;padding:28px;margin-top:18px;
                 box-shadow:0 12px 48px rgba(0,0,0,0.30);border:1px solid rgba(108,99,255,0.25);">
-        <h2 style="text-align:center;color:#f5f7ff;margin:0 0 2px;">{emoji} {emotion.capitalize()}</h2>
+        <h2 style="text-align:center;color:#f5f7ff;margin:0 0 2px;">{emoji} {title}</h2>
         <p style="text-align:center;color:#c0c0c0;margin-bottom:18px;font-size:0.95rem;">
             Confidence: <b style="color:#6c63ff;">{confidence:.0%}</b></p>
         {bars}
         <hr style="border:none;border-top:1px solid rgba(255,255,255,0.12);margin:14px 0 10px;">
         <p style="font-size:0.8rem;color:#aaa;margin-bottom:6px;">Recent detections:</p>
         <div style="display:flex;flex-wrap:wrap;">{chips}</div>
-    </div>""", unsafe_allow_html=True)
+    </div>"""
+
+
+def _card_key(emotion, confidence, scores, history):
+    """Everything the card shows, rounded to the precision it is displayed at."""
+    return (
+        emotion,
+        round(confidence * 100),
+        tuple(round(scores.get(emo, 0), 1) for emo in CARD_EMOTION_ORDER),
+        tuple(list(history)[-EMOTION_HISTORY_LEN:]),
+    )
+
+
+def _render_emotion_card(container, emotion, confidence, scores, history, cache=None):
+    """
+    Render styled emotion result card. With a ``cache`` dict, the card is only
+    re-sent when its visible content differs from the last render into it.
+    Returns True when the card was (re-)rendered.
+    """
+    key = _card_key(emotion, confidence, scores, history)
+    if cache is not None:
+        if cache.get("key") == key:
+            return False
+        cache["key"] = key
+
+    _, _, pcts, recent = key
+    bars = "".join(
+        _BAR_TEMPLATE.format(
+            label=f"{EMOTION_EMOJI.get(emo, '')} {emo.capitalize()}",
+            weight="700" if emo == emotion else "400",
+            color="#6c63ff" if emo == emotion else "rgba(255,255,255,0.18)",
+            pct=pct,
+        )
+        for emo, pct in zip(CARD_EMOTION_ORDER, pcts)
+    )
+    chips = "".join(_CHIP_HTML.get(h_emo, "") for h_emo in recent)
+
+    container.markdown(_CARD_TEMPLATE.format(
+        emoji=EMOTION_EMOJI.get(emotion, "🤔"),
+        title=emotion.capitalize(),
+        confidence=confidence,
+        bars=bars,
+        chips=chips,
+    ), unsafe_allow_html=True)
+    return True
+
+
+# ━━━━━━━━━━━━━━  FRAME PIPELINE (per-frame work, UI-free)  ━━━━━━━━━
+class EmotionPipeline:
+    """
+    Everything main() does to one camera frame, without Streamlit: mirror +
+    grayscale, detect/track faces, classify crops every Nth frame, smooth
+    the scores per face, then draw the overlay and JPEG-encode it. All
+    per-stream state (tracks, detection windows, smoothing) lives here, so
+    the shared detector and model can serve several sessions at once.
+
+    With an ``executor`` inference runs on worker threads like the live page
+    (results surface on a later frame); without one it runs inline. Pass a
+    ``timings`` dict to collect per-stage milliseconds (``STAGES``).
+    """
+
+    STAGES = ("preprocess", "detect", "classify", "smooth", "draw", "encode")
+
+    def __init__(self, face_detector, emotion_model, executor=None, smoother=None,
+                 analyse_every=ANALYSE_EVERY_N_FRAMES, batch=BATCH_INFERENCE,
+                 mirror=True, timings=None, detection_scale=DETECTION_SCALE,
+                 roi_search=DETECTION_ROI_SEARCH):
+        self.tracker = FaceTracker(
+            RegionFaceDetector(face_detector, scale=detection_scale, roi_search=roi_search)
+        )
+        self.emotion_model = emotion_model
+        self.scheduler = _InferenceScheduler(executor) if executor is not None else None
+        self.smoother = smoother if smoother is not None else EmotionSmoother()
+        self.analyse_every = max(1, analyse_every)
+        self.batch = batch
+        self.mirror = mirror
+        self.timings = timings
+        self.face_results = {}   # face ID -> smoothed (emotion, confidence, scores)
+        self.frame_count = 0
+
+    def _mark(self, stage, t0):
+        now = time.perf_counter()
+        if self.timings is not None:
+            self.timings.setdefault(stage, []).append((now - t0) * 1000.0)
+        return now
+
+    def _classify(self, frame, faces):
+        """Submit (or run) inference on this frame's faces; return results ready now."""
+        keys = [face_id for face_id, _ in faces]
+        # Copies, since the overlay is drawn onto ``frame`` while workers run
+        crops = [frame[y:y+h, x:x+w].copy() for _, (x, y, w, h) in faces]
+        if self.scheduler is None:
+            if self.batch:
+                return list(_classify_keyed_faces(self.emotion_model, keys, crops).items())
+            return [(key, _predict_emotion(self.emotion_model, crop)) for key, crop in zip(keys, crops)]
+        if self.batch:
+            # A newer frame's batch supersedes a still-queued older one
+            self.scheduler.submit("batch", _classify_keyed_faces, self.emotion_model, keys, crops)
+        else:
+            for key, crop in zip(keys, crops):
+                self.scheduler.submit(key, _predict_keyed_face, self.emotion_model, key, crop)
+        return []
+
+    def process(self, frame, render=True):
+        """
+        Run one BGR camera frame through the pipeline.
+        Returns ``(faces, updates, jpeg)``: tracked ``[(face_id, box)]``, the
+        smoothed ``[(face_id, (emotion, confidence, scores))]`` that arrived
+        this frame, and the annotated JPEG (None unless ``render``).
+        """
+        t = time.perf_counter()
+        if self.mirror:
+            frame = cv2.flip(frame, 1)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        t = self._mark("preprocess", t)
+
+        faces = self.tracker.update(frame, gray)
+        live_ids = {face_id for face_id, _ in faces}
+        for face_id in list(self.face_results):
+            if face_id not in live_ids:
+                del self.face_results[face_id]
+                self.smoother.forget(face_id)
+        t = self._mark("detect", t)
+
+        finished = []
+        if faces and self.frame_count % self.analyse_every == 0:
+            finished = self._classify(frame, faces)
+            t = self._mark("classify", t)
+        if self.scheduler is not None:
+            # Results arrive whenever the workers finish; the overlay never waits
+            finished.extend(item for batch in self.scheduler.collect().values()
+                            for item in batch.items())
+
+        updates = []
+        for key, result in finished:
+            if key not in live_ids or not result[2]:
+                continue
+            result = self.smoother.update(key, result[2])
+            self.face_results[key] = result
+            updates.append((key, result))
+        if updates:
+            t = self._mark("smooth", t)
+
+        jpeg = None
+        if render:
+            t = time.perf_counter()
+            for key, (x, y, w, h) in faces:
+                face_emotion, face_conf, _ = self.face_results.get(key, (None, 0.0, {}))
+                if face_emotion:
+                    color = EMOTION_COLORS.get(face_emotion, (200, 200, 200))
+                    emoji = EMOTION_EMOJI.get(face_emotion, "")
+                    label = f"{emoji} {face_emotion.capitalize()} {face_conf:.0%}"
+                    _draw_fancy_box(frame, x, y, w, h, color, label)
+                else:
+                    cv2.rectangle(frame, (x, y), (x+w, y+h), (200, 200, 200), 2)
+            t = self._mark("draw", t)
+            jpeg = _encode_frame(frame)
+            self._mark("encode", t)
+
+        self.frame_count += 1
+        return faces, updates, jpeg
+
+    def close(self):
+        """Cancel inference that hasn't started yet."""
+        if self.scheduler is not None:
+            self.scheduler.cancel_all()
 
 
 # ━━━━━━━━━━━━━━  MAIN  ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -187,7 +1166,8 @@ def main():
         "last_emotion": None,
         "last_confidence": 0.0,
         "last_scores": {},
-        "emotion_history": [],
+        "emotion_history": deque(maxlen=EMOTION_HISTORY_LEN),
+        "emotion_smoother": EmotionSmoother(),
         "detected_emotion": None,
     }.items():
         if key not in st.session_state:
@@ -202,7 +1182,8 @@ def main():
 
     if start_clicked:
         st.session_state.camera_running = True
-        st.session_state.emotion_history = []
+        st.session_state.emotion_history = deque(maxlen=EMOTION_HISTORY_LEN)
+        st.session_state.emotion_smoother = EmotionSmoother()
         st.session_state.detected_emotion = None
     if stop_clicked:
         st.session_state.camera_running = False
@@ -238,10 +1219,10 @@ def main():
         return
 
     # ── Camera ON ─────────────────────────────────────────────────────
-    face_cascade, DeepFace = _load_models()
+    face_detector, _, emotion_model = _load_models()
 
-    cap = _get_camera()
-    if cap is None or not cap.isOpened():
+    source = _get_video_source()
+    if source is None:
         frame_ph.error("❌ Could not open webcam. Make sure your camera is connected "
                        "and not in use by another application.")
         st.session_state.camera_running = False
@@ -250,80 +1231,82 @@ def main():
 
     status_ph.success("🟢 Camera is running — detecting emotions …")
 
-    frame_count = 0
+    smoother = st.session_state.emotion_smoother
+    # Mirror only the webcam (selfie view); recordings keep their orientation
+    pipeline = EmotionPipeline(face_detector, emotion_model, executor=_get_inference_executor(),
+                               smoother=smoother, mirror=source.kind == "webcam")
     dominant_emotion = st.session_state.last_emotion
     confidence = st.session_state.last_confidence
     scores = st.session_state.last_scores
+    card_cache = {}     # last content rendered into emotion_ph
     last_db_log_time = 0.0
+    last_seq = 0
+    last_display_time = 0.0
+    display_interval = 1.0 / MAX_DISPLAY_FPS if MAX_DISPLAY_FPS else 0.0
 
     try:
         while st.session_state.camera_running:
-            ret, frame = cap.read()
-            if not ret:
+            # Waits for the next frame the decode thread produces, so the loop
+            # paces itself to the source (and skips frames under "drop").
+            last_seq, frame = source.read(last_seq)
+            if frame is None:
+                if source.eof:
+                    # Recording played through; Start plays it again
+                    st.session_state.camera_running = False
+                    _release_camera()
+                    break
                 # Try reopening
                 _release_camera()
-                cap = _get_camera()
-                if cap is None or not cap.isOpened():
+                source = _get_video_source()
+                last_seq = 0
+                if source is None:
                     frame_ph.error("❌ Lost camera feed.")
                     break
                 continue
 
-            frame = cv2.flip(frame, 1)
-            display = frame.copy()
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            faces = face_cascade.detectMultiScale(
-                gray, scaleFactor=1.1, minNeighbors=5,
-                minSize=(60, 60), flags=cv2.CASCADE_SCALE_IMAGE,
-            )
+            # Overlay + encode only for frames actually pushed to the browser
+            now = time.perf_counter()
+            render = now - last_display_time >= display_interval
+            if render:
+                last_display_time = now
+            _, updates, jpeg = pipeline.process(frame, render=render)
+            if jpeg is not None:
+                frame_ph.image(jpeg, output_format="JPEG", use_container_width=True)
 
-            for (x, y, w, h) in faces:
-                if frame_count % ANALYSE_EVERY_N_FRAMES == 0:
-                    face_crop = frame[y:y+h, x:x+w]
-                    dominant_emotion, confidence, scores = _analyse_emotion(DeepFace, face_crop)
-                    st.session_state.last_emotion = dominant_emotion
-                    st.session_state.last_confidence = confidence
-                    st.session_state.last_scores = scores
-                    st.session_state.emotion_history.append(dominant_emotion)
-
-                    now = time.time()
-                    if (now - last_db_log_time) >= DB_LOG_COOLDOWN:
-                        user_id = st.session_state.get("user_id")
-                        if user_id:
-                            database.log_emotion_detection(user_id, dominant_emotion, confidence)
-                            database.log_user_activity(
-                                user_id, "emotion_detection",
-                                f"Detected emotion: {dominant_emotion} ({confidence:.0%})",
-                            )
-                        last_db_log_time = now
-
-                if dominant_emotion:
-                    color = EMOTION_COLORS.get(dominant_emotion, (200, 200, 200))
-                    emoji = EMOTION_EMOJI.get(dominant_emotion, "")
-                    label = f"{emoji} {dominant_emotion.capitalize()} {confidence:.0%}"
-                    _draw_fancy_box(display, x, y, w, h, color, label)
-                else:
-                    cv2.rectangle(display, (x, y), (x+w, y+h), (200, 200, 200), 2)
+            for _, result in updates:
+                dominant_emotion, confidence, scores = result
+                st.session_state.last_emotion = dominant_emotion
+                st.session_state.last_confidence = confidence
+                st.session_state.last_scores = scores
+                st.session_state.emotion_history.append(dominant_emotion)
 
-            rgb = cv2.cvtColor(display, cv2.COLOR_BGR2RGB)
-            frame_ph.image(rgb, channels="RGB", use_container_width=True)
+                now = time.time()
+                if (now - last_db_log_time) >= DB_LOG_COOLDOWN:
+                    user_id = st.session_state.get("user_id")
+                    if user_id:
+                        # Queued: the writer thread batches these off the frame loop
+                        database.queue_emotion_detection(user_id, dominant_emotion, confidence)
+                        database.queue_user_activity(
+                            user_id, "emotion_detection",
+                            f"Detected emotion: {dominant_emotion} ({confidence:.0%})",
+                        )
+                    last_db_log_time = now
 
             if dominant_emotion and scores:
                 _render_emotion_card(emotion_ph, dominant_emotion, confidence, scores,
-                                     st.session_state.emotion_history)
-
-            frame_count += 1
-            time.sleep(0.033)
+                                     st.session_state.emotion_history, cache=card_cache)
 
     except Exception as e:
         status_ph.error(f"⚠️ Camera error: {e}")
     finally:
+        pipeline.close()
+        database.flush_log_queue()
         status_ph.info("⏹ Camera stopped.")
         if dominant_emotion:
             st.session_state.detected_emotion = dominant_emotion
             user_id = st.session_state.get("user_id")
-            if user_id and st.session_state.emotion_history:
-                most_common = Counter(st.session_state.emotion_history).most_common(1)[0][0]
+            most_common = smoother.session_dominant()
+            if user_id and most_common:
                 database.save_dominant_emotion(user_id, most_common)
 
 
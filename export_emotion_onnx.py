@@ -0,0 +1,69 @@
+"""
+Export DeepFace's FER Emotion model to ONNX for the "opencv" inference engine.
+
+Run once on a machine with the full requirements plus tf2onnx
+(``pip install tf2onnx``); the app then loads models/emotion_fer.onnx with
+cv2.dnn and never imports TensorFlow:
+
+    python export_emotion_onnx.py
+    set EMORECS_INFERENCE_ENGINE=opencv   (or export ... on Linux/macOS)
+
+The export is checked against the Keras model on random input and through
+cv2.dnn before it is written.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from emotion_detection_page import EMOTION_ONNX, FER_INPUT_SIZE
+
+ONNX_OPSET = 13
+PARITY_TOLERANCE = 1e-4     # max abs difference in softmax output
+
+
+def export(output=EMOTION_ONNX, opset=ONNX_OPSET):
+    """Convert the Keras model, verify it and write ``output``. Returns the max abs diff."""
+    try:
+        import tf2onnx
+    except ImportError:
+        sys.exit("tf2onnx is required for the export: pip install tf2onnx")
+    import cv2
+    import tensorflow as tf
+    from deepface import DeepFace
+
+    client = DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+    model = getattr(client, "model", client)
+
+    spec = (tf.TensorSpec((None, FER_INPUT_SIZE, FER_INPUT_SIZE, 1), tf.float32, name="input"),)
+    # from_function rather than from_keras: the latter can't map Keras 3 output names
+    forward = tf.function(lambda x: model(x, training=False), input_signature=spec)
+    tmp = f"{output}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    tf2onnx.convert.from_function(forward, input_signature=spec, opset=opset, output_path=tmp)
+
+    sample = np.random.default_rng(0).random((4, FER_INPUT_SIZE, FER_INPUT_SIZE, 1), dtype=np.float32)
+    net = cv2.dnn.readNetFromONNX(tmp)
+    net.setInput(sample)
+    diff = float(np.abs(net.forward() - np.asarray(model.predict_on_batch(sample))).max())
+    if diff > PARITY_TOLERANCE:
+        os.remove(tmp)
+        sys.exit(f"Exported model differs from Keras by {diff:.2e} (> {PARITY_TOLERANCE:.0e})")
+    os.replace(tmp, output)
+    return diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default=EMOTION_ONNX)
+    parser.add_argument("--opset", type=int, default=ONNX_OPSET)
+    args = parser.parse_args()
+
+    diff = export(args.output, args.opset)
+    size_kb = os.path.getsize(args.output) / 1024
+    print(f"Wrote {args.output} ({size_kb:.0f} KB), max diff vs Keras {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()